@@ -3,18 +3,22 @@
 Sound Wave Analysis - Clean and Modular
 
 A user-friendly tool for analyzing WAV files with visualization.
+Run without arguments for the interactive menu, or see
+`python main.py --help` for non-interactive commands.
 
 Author: TorresjDev
 License: MIT
 """
 
 import os
-from sound_analysis.analyzer import perform_complete_analysis
-from sound_analysis.tools import select_wav_file, get_analysis_options
+import sys
 
 
 def main():
     """Main function - clean and modular."""
+    from sound_analysis.analyzer import perform_complete_analysis
+    from sound_analysis.tools import select_wav_file, get_analysis_options
+    
     print("🌊 Welcome to Sound Wave Analysis!")
     print("=" * 40)
     
@@ -38,4 +42,7 @@ def main():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        from sound_analysis.cli import main as cli_main
+        sys.exit(cli_main())
     main()
@@ -5,61 +5,58 @@ Core analysis functions for processing WAV files.
 """
 
 import os
-import wave
-import numpy as np
-from .tools import wave_to_db, wave_to_db_rms, detect_db_range, list_wav_files
-from .visualization import plot_waveform, plot_spectrogram, plot_combined_analysis
+from .audio_processing import detect_harmonics
+from .cache import NpzDiskCache, default_cache_dir, file_cache_key
+from .levels import LevelAccumulator, compute_level_metrics, levels_to_db
+from .pyramid import build_pyramid
+from .spectral import WELCH_SEGMENT_SIZE, WelchAccumulator, compute_psd
+from .wav_io import DEFAULT_BLOCK_SIZE, WaveReader, map_wave_data, mix_channels
 
 
 def get_wave_info(file_path):
     """Get basic information about a WAV file."""
     try:
-        wav_obj = wave.open(file_path, "rb")
-
-        info = {
-            'sample_rate': wav_obj.getframerate(),
-            'total_samples': wav_obj.getnframes(),
-            'channels': wav_obj.getnchannels(),
-            'sample_width': wav_obj.getsampwidth(),
-        }
-
-        info['duration'] = info['total_samples'] / info['sample_rate']
-        info['channel_type'] = "Mono" if info['channels'] == 1 else "Stereo"
-
-        wav_obj.close()
-        return info
+        with WaveReader(file_path) as reader:
+            return reader.info
 
     except Exception as e:
         raise Exception(f"Error reading WAV file info: {str(e)}")
 
 
-def load_wave_data(file_path):
-    """Load waveform data from a WAV file."""
-    try:
-        wav_obj = wave.open(file_path, "rb")
+def load_wave_data(file_path, mmap=False, normalize=False, mix='left'):
+    """
+    Load waveform data from a WAV file.
 
-        # Get file info
-        sample_rate = wav_obj.getframerate()
-        total_samples = wav_obj.getnframes()
-        channels = wav_obj.getnchannels()
+    8-bit, 16-bit, 24-bit and 32-bit PCM and 32/64-bit float files are
+    decoded according to their header. The waveform is in the 16-bit
+    integer range by default, or float32 in [-1, 1] with normalize=True.
 
-        # Read audio data
-        raw_data = wav_obj.readframes(total_samples)
-        audio_data = np.frombuffer(raw_data, dtype=np.int16)
+    All channels are returned as 'channel_data' with shape (channels,
+    samples); 'waveform' is reduced from it according to `mix` ('left',
+    'right', 'downmix', 'mid', 'side', 'all' or a channel index, see
+    wav_io.mix_channels).
 
-        # Handle mono/stereo
-        if channels == 1:
-            waveform = audio_data
-        else:
-            waveform = audio_data[0::2]  # Use left channel for stereo
+    The file header is returned as 'file_info' so callers do not need to
+    open the file a second time with get_wave_info(). With mmap=True the
+    waveform is a memory-mapped view of the file instead of a copy (see
+    wav_io.map_wave_data). For recordings too large to hold in memory,
+    stream them with wav_io.WaveReader instead.
+    """
+    try:
+        if mmap:
+            return map_wave_data(file_path, normalize=normalize, mix=mix)
 
-        wav_obj.close()
+        with WaveReader(file_path, normalize=normalize, mix='all') as reader:
+            info = reader.info
+            channel_data = reader.read()
 
         return {
-            'waveform': waveform,
-            'sample_rate': sample_rate,
-            'duration': total_samples / sample_rate,
-            'channels': channels
+            'waveform': mix_channels(channel_data, mix),
+            'channel_data': channel_data,
+            'sample_rate': info['sample_rate'],
+            'duration': info['duration'],
+            'channels': info['channels'],
+            'file_info': info
         }
 
     except Exception as e:
@@ -67,41 +64,200 @@ def load_wave_data(file_path):
 
 
 def analyze_audio_levels(waveform):
-    """Analyze various audio level metrics."""
-    # Basic statistics
-    max_amplitude = np.max(np.abs(waveform))
-    min_amplitude = np.min(np.abs(waveform))
-    mean_amplitude = np.mean(np.abs(waveform))
+    """
+    Analyze various audio level metrics.
+
+    All metrics come from one blocked, float64 pass over the waveform
+    (see levels.compute_level_metrics). For a (channels, samples) array
+    a list with one dictionary per channel is returned.
+    """
+    return levels_to_db(compute_level_metrics(waveform))
+
+
+def analyze_file_levels(file_path, mix='left', start=0, stop=None,
+                        block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Analyze the audio levels of a WAV file without loading it into memory.
+
+    The file is streamed block by block into a LevelAccumulator, so
+    memory use is bounded by `block_size` regardless of the file length.
+    Use stream_file_levels() to get mergeable per-shard accumulators.
+
+    Returns the same dictionary as analyze_audio_levels().
+    """
+    return stream_file_levels(file_path, mix, start, stop, block_size).result()
+
+
+def stream_file_levels(file_path, mix='left', start=0, stop=None,
+                       block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Stream a WAV file (or the frames [start, stop) of it) into a
+    LevelAccumulator and return the accumulator.
+
+    Accumulators from different shards or files can be combined with
+    LevelAccumulator.merge().
+    """
+    try:
+        levels = LevelAccumulator()
+        with WaveReader(file_path, mix=mix) as reader:
+            for block in reader.blocks(block_size, start=start, stop=stop):
+                levels.update(block)
+        return levels
+
+    except Exception as e:
+        raise Exception(f"Error analyzing WAV levels: {str(e)}")
+
+
+def analyze_file_psd(file_path, mix='left', start=0, stop=None,
+                     block_size=DEFAULT_BLOCK_SIZE, nperseg=WELCH_SEGMENT_SIZE):
+    """
+    Estimate the Welch PSD of a WAV file without loading it into memory.
+
+    Use stream_file_psd() to get mergeable per-shard (or per-file)
+    accumulators. Returns the same dictionary as compute_psd().
+    """
+    return stream_file_psd(file_path, mix, start, stop, block_size, nperseg).result()
 
-    # Decibel calculations
-    avg_db = wave_to_db(waveform)
-    rms_db = wave_to_db_rms(waveform)
-    db_range = detect_db_range(waveform)
+
+def stream_file_psd(file_path, mix='left', start=0, stop=None,
+                    block_size=DEFAULT_BLOCK_SIZE, nperseg=WELCH_SEGMENT_SIZE, psd=None):
+    """
+    Stream a WAV file (or the frames [start, stop) of it) into a
+    WelchAccumulator and return the accumulator.
+
+    Pass an existing accumulator as `psd` to average several files in
+    one pass; accumulators from parallel workers combine with
+    WelchAccumulator.merge(). The segment length depends only on the
+    whole file (not on [start, stop)), so shards of one file always merge.
+    """
+    try:
+        with WaveReader(file_path, mix=mix) as reader:
+            if psd is None:
+                # Same segment cap as compute_psd() for short files, taken
+                # from the whole file so every shard agrees
+                total_samples = reader.info['total_samples']
+                psd = WelchAccumulator(reader.info['sample_rate'],
+                                       max(1, min(nperseg, total_samples // 4)))
+            elif psd.sample_rate != reader.info['sample_rate']:
+                raise ValueError("Sample rate does not match the accumulated PSD")
+            for block in reader.blocks(block_size, start=start, stop=stop):
+                psd.update(block)
+        return psd.end_stream()
+
+    except Exception as e:
+        raise Exception(f"Error analyzing WAV spectrum: {str(e)}")
+
+
+# Bump when analysis results change so stale cache entries are ignored
+# (3: pyramid spectrogram levels moved to the shared STFT engine, with
+# one-sided PSD scaling and frame-centre times; 4: pyramid spectrogram
+# frames cover every sample and are averaged into the capped columns)
+ANALYSIS_CACHE_VERSION = 4
+
+
+def get_analysis_cache(cache_dir=None):
+    """Return the persistent on-disk analysis cache (see cache.default_cache_dir)."""
+    return NpzDiskCache(cache_dir or default_cache_dir())
+
+
+def compute_analysis(wave_data):
+    """
+    Compute the cacheable analysis of loaded wave data.
+
+    Returns a dictionary with 'file_info', 'audio_levels', 'harmonics'
+    and 'psd' (Welch power spectral density).
+    """
+    waveform = wave_data['waveform']
+    sample_rate = wave_data['sample_rate']
 
     return {
-        'max_amplitude': max_amplitude,
-        'min_amplitude': min_amplitude,
-        'mean_amplitude': mean_amplitude,
-        'avg_db': avg_db,
-        'rms_db': rms_db,
-        'db_range': db_range
+        'file_info': wave_data['file_info'],
+        'audio_levels': analyze_audio_levels(waveform),
+        'harmonics': detect_harmonics(waveform, sample_rate),
+        'psd': compute_psd(waveform, sample_rate)
     }
 
 
-def perform_complete_analysis(file_path, show_plots=True, save_figures=False):
-    """Perform complete analysis of a WAV file."""
+def analyze_file(file_path, mix='left', cache=None, use_hash=False):
+    """
+    Analyze a WAV file, reusing cached results when the file is unchanged.
+
+    Args:
+        file_path: Path to the WAV file
+        mix: Channel mode (see wav_io.mix_channels)
+        cache: Cache with get()/put() (e.g. get_analysis_cache()); None
+               disables caching
+        use_hash: Identify the file by content hash instead of path,
+                  size and modification time
+
+    Returns the compute_analysis() dictionary plus 'cached' (True when the
+    results came from the cache) and 'wave_data' (None when cached, so a
+    cache hit never reads the audio).
+    """
+    key = None
+    if cache is not None:
+        key = file_cache_key(file_path, mix, ANALYSIS_CACHE_VERSION, use_hash=use_hash)
+        results = cache.get(key)
+        if results is not None:
+            results.update({'cached': True, 'wave_data': None})
+            return results
+
+    wave_data = load_wave_data(file_path, mix=mix)
+    results = compute_analysis(wave_data)
+
+    if cache is not None:
+        cache.put(key, results)
+
+    results.update({'cached': False, 'wave_data': wave_data})
+    return results
+
+
+def load_pyramid(file_path, mix='left', cache=None, use_hash=False):
+    """
+    Return the zoomable overview pyramid of a WAV file (see pyramid.py).
+
+    The pyramid is built once per file and stored in `cache` next to the
+    analysis results, under its own key, so later zoom views never reread
+    the audio.
+    """
+    key = None
+    if cache is not None:
+        key = file_cache_key(file_path, mix, 'pyramid', ANALYSIS_CACHE_VERSION, use_hash=use_hash)
+        pyramid = cache.get(key)
+        if pyramid is not None:
+            return pyramid
+
     try:
-        # Get file info
-        file_info = get_wave_info(file_path)
+        # Memory-mapped: the builder reads the samples in chunks
+        wave_data = map_wave_data(file_path, mix=mix)
+    except ValueError:
+        wave_data = load_wave_data(file_path, mix=mix)  # 24-bit data cannot be mapped
+    pyramid = build_pyramid(wave_data['waveform'], wave_data['sample_rate'])
 
-        # Load waveform data
-        wave_data = load_wave_data(file_path)
-        waveform = wave_data['waveform']
-        sample_rate = wave_data['sample_rate']
-        duration = wave_data['duration']
+    if cache is not None:
+        cache.put(key, pyramid)
+    return pyramid
 
-        # Analyze audio levels
-        audio_levels = analyze_audio_levels(waveform)
+
+def perform_complete_analysis(file_path, show_plots=True, save_figures=False, use_cache=True):
+    """
+    Perform complete analysis of a WAV file.
+
+    Levels, harmonics and the PSD are stored in the persistent analysis
+    cache, so re-running on an unchanged file skips the computation.
+    """
+    try:
+        cache = get_analysis_cache() if use_cache else None
+        analysis = analyze_file(file_path, cache=cache)
+        file_info = analysis['file_info']
+        audio_levels = analysis['audio_levels']
+        harmonics = analysis['harmonics']
+        duration = file_info['duration']
+
+        # Plots need the samples even when the analysis was cached
+        wave_data = analysis['wave_data']
+        if show_plots and wave_data is None:
+            wave_data = load_wave_data(file_path)
 
         # Create filename for plots
         filename = os.path.basename(file_path)
@@ -124,9 +280,23 @@ def perform_complete_analysis(file_path, show_plots=True, save_figures=False):
         print(f"📈 Max dB: {audio_levels['db_range']['max_db']:.2f}")
         print(f"📉 Min dB: {audio_levels['db_range']['min_db']:.2f}")
 
+        if harmonics:
+            print("\n🎵 Harmonics:")
+            for harm in harmonics[:5]:
+                label = "Fundamental" if harm['harmonic'] == 1 else f"Harmonic {harm['harmonic']}"
+                print(f"   {label}: {harm['frequency']:.1f} Hz ({harm['magnitude_db']:.1f} dB)")
+
+        if analysis['cached']:
+            print("\n⚡ Loaded from analysis cache")
+
         # Generate visualizations
         if show_plots:
+            # Imported here so analysis-only runs never load matplotlib
+            from .visualization import plot_waveform, plot_spectrogram
+
             print("\n🎨 Generating visualizations...")
+            waveform = wave_data['waveform']
+            sample_rate = wave_data['sample_rate']
 
             if save_figures:
                 figures_dir = "figures"
@@ -154,7 +324,9 @@ def perform_complete_analysis(file_path, show_plots=True, save_figures=False):
         return {
             'file_info': file_info,
             'wave_data': wave_data,
-            'audio_levels': audio_levels
+            'audio_levels': audio_levels,
+            'harmonics': harmonics,
+            'psd': analysis['psd']
         }
 
     except Exception as e:
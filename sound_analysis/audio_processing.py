@@ -8,16 +8,25 @@ Supports WAV, MP3, and FLAC formats.
 import io
 import tempfile
 import os
+from importlib.util import find_spec
 import numpy as np
-from scipy import signal
-from scipy.io import wavfile
+from .filters import design_filter, filter_signal
+from .spectral import compute_averaged_spectrum, interpolate_peaks
 
-# Try to import pydub for MP3/FLAC support
-try:
-    from pydub import AudioSegment
-    PYDUB_AVAILABLE = True
-except ImportError:
-    PYDUB_AVAILABLE = False
+# Harmonic detection: peak thresholds (dB relative to the strongest peak)
+HARMONIC_FLOOR_DB = -60
+HARMONIC_PROMINENCE_DB = 10
+# Candidate fundamentals: the strongest peaks within this range of the maximum
+FUNDAMENTAL_CANDIDATES = 10
+FUNDAMENTAL_RANGE_DB = 30
+# A peak belongs to harmonic k if it lies within this many bins, or this
+# fraction of k * f0, of the expected frequency
+HARMONIC_TOLERANCE_BINS = 1.5
+HARMONIC_TOLERANCE = 0.01
+
+# pydub (MP3/FLAC support) and scipy.signal are imported by the functions
+# that use them, so importing this module stays cheap
+PYDUB_AVAILABLE = find_spec('pydub') is not None
 
 
 def convert_audio_to_wav(uploaded_file, file_extension):
@@ -40,19 +49,7 @@ def convert_audio_to_wav(uploaded_file, file_extension):
             # Already WAV, just return the path
             return tmp_input_path
         
-        # Convert to WAV using pydub
-        if file_extension == '.mp3':
-            audio = AudioSegment.from_mp3(tmp_input_path)
-        elif file_extension == '.flac':
-            audio = AudioSegment.from_file(tmp_input_path, format='flac')
-        else:
-            audio = AudioSegment.from_file(tmp_input_path)
-        
-        # Export as WAV
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_output:
-            tmp_output_path = tmp_output.name
-        
-        audio.export(tmp_output_path, format='wav')
+        tmp_output_path = convert_file_to_wav(tmp_input_path)
         
         # Clean up input temp file
         os.unlink(tmp_input_path)
@@ -66,87 +63,142 @@ def convert_audio_to_wav(uploaded_file, file_extension):
         raise Exception(f"Error converting audio: {str(e)}")
 
 
-def apply_lowpass_filter(waveform, sample_rate, cutoff_freq, order=5):
-    """Apply a low-pass Butterworth filter."""
-    nyquist = sample_rate / 2
-    normalized_cutoff = cutoff_freq / nyquist
+def convert_file_to_wav(file_path):
+    """
+    Convert an MP3/FLAC (or other ffmpeg-readable) file on disk to WAV.
+    
+    Returns: Path to a temporary WAV file; the caller deletes it
+    """
+    if not PYDUB_AVAILABLE:
+        raise ImportError("pydub is required for MP3/FLAC support. Install with: pip install pydub")
+    
+    from pydub import AudioSegment
+    
+    file_extension = os.path.splitext(file_path)[1].lower()
+    
+    # Convert to WAV using pydub
+    if file_extension == '.mp3':
+        audio = AudioSegment.from_mp3(file_path)
+    elif file_extension == '.flac':
+        audio = AudioSegment.from_file(file_path, format='flac')
+    else:
+        audio = AudioSegment.from_file(file_path)
+    
+    # Export as WAV
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_output:
+        tmp_output_path = tmp_output.name
     
-    if normalized_cutoff >= 1:
+    try:
+        audio.export(tmp_output_path, format='wav')
+    except Exception:
+        os.unlink(tmp_output_path)
+        raise
+    
+    return tmp_output_path
+
+
+def apply_lowpass_filter(waveform, sample_rate, cutoff_freq, order=5, zero_phase=True):
+    """Apply a low-pass Butterworth filter (zero-phase unless zero_phase=False)."""
+    if cutoff_freq >= sample_rate / 2:
         return waveform  # Cutoff is too high, return original
     
-    b, a = signal.butter(order, normalized_cutoff, btype='low', analog=False)
-    filtered = signal.filtfilt(b, a, waveform)
+    sos = design_filter('lowpass', cutoff_freq, order, sample_rate)
+    filtered = filter_signal(waveform, sos, zero_phase)
     return filtered.astype(waveform.dtype)
 
 
-def apply_highpass_filter(waveform, sample_rate, cutoff_freq, order=5):
-    """Apply a high-pass Butterworth filter."""
-    nyquist = sample_rate / 2
-    normalized_cutoff = cutoff_freq / nyquist
-    
-    if normalized_cutoff <= 0:
+def apply_highpass_filter(waveform, sample_rate, cutoff_freq, order=5, zero_phase=True):
+    """Apply a high-pass Butterworth filter (zero-phase unless zero_phase=False)."""
+    if cutoff_freq <= 0:
         return waveform  # Cutoff is too low, return original
     
-    b, a = signal.butter(order, normalized_cutoff, btype='high', analog=False)
-    filtered = signal.filtfilt(b, a, waveform)
+    sos = design_filter('highpass', cutoff_freq, order, sample_rate)
+    filtered = filter_signal(waveform, sos, zero_phase)
     return filtered.astype(waveform.dtype)
 
 
-def apply_bandpass_filter(waveform, sample_rate, low_freq, high_freq, order=5):
-    """Apply a band-pass Butterworth filter."""
+def apply_bandpass_filter(waveform, sample_rate, low_freq, high_freq, order=5, zero_phase=True):
+    """Apply a band-pass Butterworth filter (zero-phase unless zero_phase=False)."""
     nyquist = sample_rate / 2
-    low = low_freq / nyquist
-    high = high_freq / nyquist
-    
-    if low <= 0:
-        low = 0.001
-    if high >= 1:
-        high = 0.999
+    low = max(low_freq, 0.001 * nyquist)
+    high = min(high_freq, 0.999 * nyquist)
     if low >= high:
         return waveform
     
-    b, a = signal.butter(order, [low, high], btype='band', analog=False)
-    filtered = signal.filtfilt(b, a, waveform)
+    sos = design_filter('bandpass', (low, high), order, sample_rate)
+    filtered = filter_signal(waveform, sos, zero_phase)
     return filtered.astype(waveform.dtype)
 
 
-def detect_harmonics(waveform, sample_rate, num_harmonics=10):
-    """
-    Detect the fundamental frequency and harmonics.
+def _match_harmonic_series(peak_freqs, fundamental, num_harmonics, bin_hz):
+    """Return (k, peak index) pairs for peaks near k * fundamental."""
+    orders = np.arange(1, num_harmonics + 1)
+    targets = orders * fundamental
+    # Allow for bin quantization and slight inharmonicity of higher partials
+    tolerance = np.maximum(HARMONIC_TOLERANCE_BINS * bin_hz, HARMONIC_TOLERANCE * targets)
+
+    distance = np.abs(peak_freqs[None, :] - targets[:, None])
+    nearest = distance.argmin(axis=1)
+    matched = distance[orders - 1, nearest] <= tolerance
+    return list(zip(orders[matched], nearest[matched]))
+
+
+def _harmonics_from_power(power_db, bin_hz, num_harmonics):
+    """Pick the harmonic series of the best fundamental from an averaged dB spectrum."""
+    from scipy import signal
     
-    Returns a list of (frequency, magnitude_db) tuples.
-    """
-    # Compute FFT
-    fft = np.fft.fft(waveform)
-    freqs = np.fft.fftfreq(len(fft), 1/sample_rate)
-    magnitude = np.abs(fft)
+    peaks, _ = signal.find_peaks(power_db, height=HARMONIC_FLOOR_DB,
+                                 prominence=HARMONIC_PROMINENCE_DB)
+    if len(peaks) == 0:
+        return []
     
-    # Only positive frequencies
-    positive_mask = freqs > 0
-    freqs = freqs[positive_mask]
-    magnitude = magnitude[positive_mask]
+    positions, heights = interpolate_peaks(power_db, peaks)
+    peak_freqs = positions * bin_hz
+    heights = heights - heights.max()
+    power = 10 ** (heights / 10)
     
-    # Find peaks
-    peaks, properties = signal.find_peaks(magnitude, height=np.max(magnitude) * 0.01)
+    # Fundamental candidates: the strongest peaks; each is scored by the
+    # power of the peaks that fall on its harmonic series
+    order = np.argsort(heights)[::-1][:FUNDAMENTAL_CANDIDATES]
+    order = order[heights[order] >= -FUNDAMENTAL_RANGE_DB]
+    candidates = [
+        _match_harmonic_series(peak_freqs, peak_freqs[candidate], num_harmonics, bin_hz)
+        for candidate in order
+    ]
+    best_series = max(candidates, key=lambda series: sum(power[index] for _, index in series))
     
-    if len(peaks) == 0:
-        return []
+    return [
+        {
+            'frequency': float(peak_freqs[index]),
+            'magnitude_db': float(heights[index]),
+            'harmonic': int(k)
+        }
+        for k, index in best_series
+    ]
+
+
+def detect_harmonics(waveform, sample_rate, num_harmonics=10):
+    """
+    Detect the fundamental frequency and its harmonics.
     
-    # Sort by magnitude
-    peak_magnitudes = magnitude[peaks]
-    sorted_indices = np.argsort(peak_magnitudes)[::-1]
-    
-    # Get top harmonics
-    harmonics = []
-    for i in sorted_indices[:num_harmonics]:
-        freq = freqs[peaks[i]]
-        mag_db = 20 * np.log10(peak_magnitudes[i] / np.max(magnitude) + 1e-10)
-        harmonics.append({
-            'frequency': freq,
-            'magnitude_db': mag_db
-        })
-    
-    return harmonics
+    The spectrum is averaged over Hann-windowed frames spread across the
+    waveform (see spectral.compute_averaged_spectrum), so the cost does not
+    grow with the file length. Peaks are refined to sub-bin accuracy with
+    parabolic interpolation, and the fundamental is the strong peak whose
+    harmonic series explains the most spectral power.
+    
+    Returns a list of dictionaries ordered by harmonic number, fundamental
+    first, each with 'frequency' (Hz), 'magnitude_db' (relative to the
+    strongest peak) and 'harmonic' (1 for the fundamental, k for the k-th
+    multiple); or one such list per channel for (channels, samples) input.
+    """
+    spectrum = compute_averaged_spectrum(waveform, sample_rate)
+    power_db = spectrum['power_db']
+    bin_hz = sample_rate / spectrum['frame_size']
+    
+    if power_db.ndim > 1:
+        return [_harmonics_from_power(channel, bin_hz, num_harmonics) for channel in power_db]
+    return _harmonics_from_power(power_db, bin_hz, num_harmonics)
 
 
 def calculate_speed_of_sound(temperature_celsius=20, medium='air'):
@@ -190,6 +242,8 @@ def generate_synthetic_wave(wave_type, frequency, duration, sample_rate=44100, a
     Returns:
         numpy array of the waveform
     """
+    from scipy import signal
+    
     t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
     
     if wave_type == 'sine':
@@ -218,6 +272,8 @@ def export_audio_to_wav_bytes(waveform, sample_rate):
     
     Returns: BytesIO object containing WAV data
     """
+    from scipy.io import wavfile
+    
     buffer = io.BytesIO()
     wavfile.write(buffer, sample_rate, waveform)
     buffer.seek(0)
@@ -0,0 +1,189 @@
+"""
+Batch Analysis
+
+Non-interactive analysis of every audio file under a directory tree,
+spread across a pool of worker processes.
+"""
+
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .analyzer import (ANALYSIS_CACHE_VERSION, analyze_file, compute_analysis,
+                       get_analysis_cache, load_wave_data)
+from .audio_processing import convert_file_to_wav
+from .cache import file_cache_key
+
+
+# File types picked up by find_audio_files()
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac')
+
+# Default cap on the total size of files being analyzed at once
+DEFAULT_MAX_PENDING_BYTES = 1024 * 1024 * 1024
+
+# Analysis caches of this process by directory, so a worker scans each
+# cache directory once rather than once per file
+_worker_caches = {}
+
+
+def find_audio_files(root, extensions=AUDIO_EXTENSIONS):
+    """Yield audio file paths under `root` (recursively, in sorted order)."""
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(tuple(extensions)):
+                yield os.path.join(dir_path, file_name)
+
+
+def summarize_levels(file_path, analysis):
+    """
+    Reduce an analyze_file() result to a flat, JSON-friendly summary.
+
+    Multi-channel results (mix='all') report the first channel's levels.
+    """
+    file_info = analysis['file_info']
+    levels = analysis['audio_levels']
+    if isinstance(levels, list):
+        levels = levels[0]
+    harmonics = analysis['harmonics']
+    if harmonics and isinstance(harmonics[0], list):
+        harmonics = harmonics[0]
+
+    return {
+        'file': file_path,
+        'sample_rate': int(file_info['sample_rate']),
+        'duration': float(file_info['duration']),
+        'channels': int(file_info['channels']),
+        'avg_db': float(levels['avg_db']),
+        'rms_db': float(levels['rms_db']),
+        'max_db': float(levels['db_range']['max_db']),
+        'min_db': float(levels['db_range']['min_db']),
+        'dynamic_range': float(levels['db_range']['dynamic_range']),
+        'peak_frequency': float(harmonics[0]['frequency']) if harmonics else None,
+        'cached': bool(analysis['cached'])
+    }
+
+
+def _get_worker_cache(cache_dir):
+    """Return this process's analysis cache for `cache_dir`, opening it once."""
+    if cache_dir not in _worker_caches:
+        _worker_caches[cache_dir] = get_analysis_cache(cache_dir)
+    return _worker_caches[cache_dir]
+
+
+def analyze_path(file_path, mix='left', cache_dir=None, use_cache=True):
+    """
+    Analyze one audio file and return its summary (worker entry point).
+
+    MP3/FLAC files are converted to a temporary WAV first (needs pydub);
+    they are cached under their own path, size and modification time, so
+    a cache hit skips the conversion. Only the small summary is returned
+    so no sample data crosses process boundaries.
+    """
+    cache = _get_worker_cache(cache_dir) if use_cache else None
+
+    if file_path.lower().endswith('.wav'):
+        return summarize_levels(file_path, analyze_file(file_path, mix, cache))
+
+    key = file_cache_key(file_path, mix, ANALYSIS_CACHE_VERSION) if cache is not None else None
+    analysis = cache.get(key) if cache is not None else None
+    if analysis is not None:
+        analysis['cached'] = True
+        return summarize_levels(file_path, analysis)
+
+    wav_path = convert_file_to_wav(file_path)
+    try:
+        analysis = compute_analysis(load_wave_data(wav_path, mix=mix))
+    finally:
+        os.unlink(wav_path)
+
+    if cache is not None:
+        cache.put(key, analysis)
+    analysis['cached'] = False
+    return summarize_levels(file_path, analysis)
+
+
+def analyze_directory(root, workers=None, mix='left', use_cache=True, cache_dir=None,
+                      max_pending=None, max_pending_bytes=DEFAULT_MAX_PENDING_BYTES):
+    """
+    Analyze every audio file under `root` in a process pool.
+
+    Args:
+        root: Directory to search recursively
+        workers: Worker processes (default: one per CPU)
+        mix: Channel mode for every file (see wav_io.mix_channels)
+        use_cache: Reuse/store results in the persistent analysis cache
+        cache_dir: Cache directory (default: cache.default_cache_dir())
+        max_pending: Most files in flight at once (default: 2 per worker)
+        max_pending_bytes: Most bytes of audio in flight at once; a file
+                           larger than this is still run, but alone
+
+    Files are submitted lazily, so memory stays bounded however many files
+    the tree holds.
+
+    Yields (file_path, summary, error) tuples as files finish, in
+    completion order; exactly one of summary and error is None.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    files = find_audio_files(root)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        pending_bytes = 0
+        next_file = next(files, None)
+
+        while next_file is not None or pending:
+            # Submit while under both the count and the memory budget
+            while next_file is not None and len(pending) < max_pending:
+                size = os.path.getsize(next_file)
+                if pending and pending_bytes + size > max_pending_bytes:
+                    break
+                future = pool.submit(analyze_path, next_file, mix, cache_dir, use_cache)
+                pending[future] = (next_file, size)
+                pending_bytes += size
+                next_file = next(files, None)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, size = pending.pop(future)
+                pending_bytes -= size
+                try:
+                    yield file_path, future.result(), None
+                except Exception as e:
+                    yield file_path, None, str(e)
+
+
+def summarize_batch(summaries, errors=0):
+    """
+    Combine per-file summaries into one batch summary.
+
+    Returns a dictionary with file counts, total duration, the
+    energy-averaged RMS level and the loudest/quietest files.
+    """
+    summaries = list(summaries)
+    combined = {
+        'files': len(summaries) + errors,
+        'succeeded': len(summaries),
+        'failed': errors,
+        'cached': sum(1 for s in summaries if s['cached']),
+        'total_duration': sum(s['duration'] for s in summaries)
+    }
+
+    if summaries:
+        # Average power rather than dB values, weighted by duration
+        weights = [s['duration'] for s in summaries]
+        if not any(weights):
+            weights = [1.0] * len(summaries)
+        mean_power = sum(10 ** (s['rms_db'] / 10) * weight
+                         for s, weight in zip(summaries, weights)) / sum(weights)
+
+        loudest = max(summaries, key=lambda s: s['rms_db'])
+        quietest = min(summaries, key=lambda s: s['rms_db'])
+        combined.update({
+            'mean_rms_db': 10 * math.log10(mean_power) if mean_power > 0 else float('-inf'),
+            'loudest': {'file': loudest['file'], 'rms_db': loudest['rms_db']},
+            'quietest': {'file': quietest['file'], 'rms_db': quietest['rms_db']}
+        })
+
+    return combined
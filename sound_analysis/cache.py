@@ -0,0 +1,338 @@
+"""
+Analysis Result Caching
+
+Content-addressed caches so repeated analysis of the same audio is served
+from memory (or disk) instead of being recomputed.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+import numpy as np
+
+
+# Default memory budget for cached analysis results
+DEFAULT_MEMORY_BYTES = 512 * 1024 * 1024
+
+# Default size cap for an on-disk cache directory
+DEFAULT_DISK_BYTES = 2 * 1024 * 1024 * 1024
+
+# Age after which a leftover temp file is assumed to be from a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+
+def hash_content(data):
+    """Return the SHA-256 hex digest of a bytes-like object (no copy)."""
+    return hashlib.sha256(memoryview(data)).hexdigest()
+
+
+def make_cache_key(*parts):
+    """Join content hashes and analysis parameters into one cache key."""
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def file_cache_key(file_path, *params, use_hash=False):
+    """
+    Build a cache key for a file on disk plus analysis parameters.
+
+    By default the file is identified by its absolute path, size and
+    modification time, which costs one stat() call. With use_hash=True
+    the content is hashed instead, so renamed or copied files still hit.
+    """
+    if use_hash:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return make_cache_key(digest.hexdigest(), *params)
+
+    stat = os.stat(file_path)
+    return make_cache_key(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, *params)
+
+
+def default_cache_dir():
+    """Return the analysis cache directory ($SOUND_ANALYSIS_CACHE_DIR or ~/.cache)."""
+    return os.environ.get(
+        'SOUND_ANALYSIS_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'sound_analysis')
+    )
+
+
+def estimate_size(value, _seen=None):
+    """
+    Approximate the memory held by nested dicts/lists of arrays, in bytes.
+
+    Arrays count their `nbytes` (each array once, however often it is
+    referenced); other leaves count a small fixed overhead. This is the
+    cost of the cached data without serializing it.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_size(item, seen) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item, seen) for item in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 16
+
+
+def _flatten(value, prefix, arrays):
+    """Flatten nested dicts/lists of arrays and scalars into '/'-separated keys."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, f"{prefix}{key}/", arrays)
+    elif isinstance(value, (list, tuple)):
+        arrays[f"{prefix}#len"] = np.asarray(len(value))
+        for index, item in enumerate(value):
+            _flatten(item, f"{prefix}#{index}/", arrays)
+    else:
+        arrays[prefix.rstrip('/')] = np.asarray(value)
+
+
+def _unflatten(arrays):
+    """Rebuild the nested structure written by _flatten()."""
+    root = {}
+    for name, array in arrays.items():
+        node = root
+        *parents, leaf = name.split('/')
+        for part in parents:
+            node = node.setdefault(part, {})
+        # .item() so scalars come back as Python types, as on a cache miss
+        node[leaf] = array.item() if array.ndim == 0 else array
+
+    def _restore_lists(node):
+        if not isinstance(node, dict):
+            return node
+        if '#len' in node:
+            return [_restore_lists(node[f"#{index}"]) for index in range(int(node['#len']))]
+        return {key: _restore_lists(item) for key, item in node.items()}
+
+    return _restore_lists(root)
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache bounded by total size in bytes.
+
+    Each entry is stored with its size; least recently used entries are
+    evicted until the total fits in `max_bytes`. An entry larger than the
+    whole budget is not stored.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, marking it recently used."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, size):
+        """Store `value` under `key`, evicting old entries to fit `size`."""
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+class DiskCache:
+    """
+    Size-capped cache of pickled values in a directory.
+
+    Files are written atomically (temp file + rename) so concurrent
+    readers never see partial entries. Reads refresh a file's timestamp.
+    A running total of the directory size is kept, so the directory is
+    only scanned when it grows past `max_bytes`; the scan then deletes
+    the least recently used files and stale temp files of crashed writers.
+    """
+
+    suffix = '.pkl'
+    load_errors = (OSError, EOFError, pickle.UnpicklingError, ValueError)
+
+    def __init__(self, directory, max_bytes=DEFAULT_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = None  # Unknown until the first scan
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _dump(self, value, f):
+        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+
+    def size(self, key):
+        """Return the stored size of `key` in bytes (0 if missing)."""
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return 0
+
+    def get(self, key, default=None):
+        """Return the cached value for `key`, or `default` if missing or unreadable."""
+        path = self._path(key)
+        try:
+            value = self._load(path)
+            os.utime(path)
+            return value
+        except self.load_errors:
+            return default
+
+    def put(self, key, value):
+        """Store `value` under `key`."""
+        if self.total_bytes is None:
+            self.evict()
+
+        replaced = self.size(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                self._dump(value, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.total_bytes += self.size(key) - replaced
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Scan the directory and delete least recently used entries until
+        the cache fits `max_bytes`; also resets the running size total.
+        """
+        entries = []
+        total = 0
+        stale = time.time() - STALE_TEMP_SECONDS
+        for entry in os.scandir(self.directory):
+            is_temp = entry.name.endswith('.tmp')
+            if not (is_temp or entry.name.endswith(self.suffix)):
+                continue
+            try:
+                stat = entry.stat()
+                if is_temp:
+                    if stat.st_mtime < stale:
+                        os.unlink(entry.path)
+                    continue
+            except OSError:
+                continue  # Removed by another process
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+        self.total_bytes = total
+
+
+class NpzDiskCache(DiskCache):
+    """
+    DiskCache that stores nested analysis results as compressed .npz files.
+
+    Values are dictionaries (and lists) of NumPy arrays and scalars, such
+    as levels, spectra and harmonic lists. The format is compact, needs no
+    pickle to load, and arrays come back as NumPy arrays.
+    """
+
+    suffix = '.npz'
+    load_errors = (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile)
+
+    def _load(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            return _unflatten({name: data[name] for name in data.files})
+
+    def _dump(self, value, f):
+        arrays = {}
+        _flatten(value, '', arrays)
+        np.savez_compressed(f, **arrays)
+
+
+class AnalysisCache:
+    """
+    Two-tier analysis result cache: memory LRU backed by an optional disk tier.
+
+    Values are sized by estimate_size() (their arrays' nbytes), so
+    storing never serializes them except to write the disk tier. Disk
+    hits are promoted to the memory tier.
+
+    Usage:
+        cache = AnalysisCache(disk_dir=".cache/analysis")
+        key = make_cache_key(hash_content(data), "downmix")
+        results = cache.get(key)
+        if results is None:
+            results = analyze(...)
+            cache.put(key, results)
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, disk_dir=None,
+                 max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.memory = LRUCache(max_bytes)
+        self.disk = DiskCache(disk_dir, max_disk_bytes) if disk_dir else None
+
+    def get(self, key, default=None):
+        """Look up `key` in memory, then on disk."""
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value, estimate_size(value))
+                return value
+
+        return default
+
+    def put(self, key, value):
+        """Store `value` in every tier."""
+        self.memory.put(key, value, estimate_size(value))
+        if self.disk is not None:
+            self.disk.put(key, value)
@@ -0,0 +1,245 @@
+"""
+Command-Line Interface
+
+Non-interactive commands for scripted and batch use:
+
+    python main.py analyze FILE... [--metrics info,levels,harmonics,psd]
+                                   [--format json|ndjson|parquet] [-o PATH]
+    python main.py batch DIR [--workers N] [--mix MODE] [--no-cache]
+
+Running main.py without arguments starts the interactive menu instead.
+These commands never import the plotting libraries and never prompt.
+
+Exit codes: 0 success, 1 one or more files failed, 2 usage or setup error.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+
+# Metrics the analyze command can report
+METRICS = ['info', 'levels', 'harmonics', 'psd']
+DEFAULT_METRICS = 'info,levels,harmonics'
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FILE_ERRORS = 1
+EXIT_USAGE = 2
+
+
+def _to_builtin(value):
+    """Convert NumPy values to JSON-compatible Python types (non-finite -> None)."""
+    if isinstance(value, dict):
+        return {key: _to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _to_builtin(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def analyze_record(file_path, metrics, mix='left', use_cache=True):
+    """
+    Analyze one WAV file and return a record with the requested metrics.
+
+    With only 'info'/'levels'/'psd' requested and caching off, the file
+    is streamed so its samples are never held in memory at once.
+    """
+    from .analyzer import (analyze_file, analyze_file_levels, analyze_file_psd,
+                           get_analysis_cache, get_wave_info)
+
+    record = {'file': file_path}
+
+    if not use_cache and set(metrics) <= {'info', 'levels', 'psd'}:
+        if 'info' in metrics:
+            record['info'] = get_wave_info(file_path)
+        if 'levels' in metrics:
+            record['levels'] = analyze_file_levels(file_path, mix=mix)
+        if 'psd' in metrics:
+            psd = analyze_file_psd(file_path, mix=mix)
+            record['psd'] = {'freqs': psd['freqs'], 'psd_db': psd['psd_db']}
+        return _to_builtin(record)
+
+    cache = get_analysis_cache() if use_cache else None
+    analysis = analyze_file(file_path, mix=mix, cache=cache)
+    sections = {
+        'info': analysis['file_info'],
+        'levels': analysis['audio_levels'],
+        'harmonics': analysis['harmonics'],
+        'psd': {'freqs': analysis['psd']['freqs'], 'psd_db': analysis['psd']['psd_db']}
+    }
+    for metric in metrics:
+        record[metric] = sections[metric]
+    return _to_builtin(record)
+
+
+def _write_parquet(records, output):
+    """Write records as a Parquet table (requires pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Nested sections are stored as JSON text so files with different
+    # channel layouts share one schema
+    rows = [
+        {key: value if key in ('file', 'error') else json.dumps(value)
+         for key, value in record.items()}
+        for record in records
+    ]
+    table = pa.Table.from_pylist(rows)
+
+    if output is None:
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink)
+        sys.stdout.buffer.write(sink.getvalue().to_pybytes())
+        sys.stdout.buffer.flush()
+    else:
+        pq.write_table(table, output)
+
+
+def run_analyze(args):
+    """Analyze files and write machine-readable results."""
+    metrics = [metric.strip() for metric in args.metrics.split(',') if metric.strip()]
+    unknown = sorted(set(metrics) - set(METRICS))
+    if unknown or not metrics:
+        print(f"error: unknown metrics {unknown}; choose from {','.join(METRICS)}",
+              file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("error: parquet output requires pyarrow (pip install pyarrow)",
+                  file=sys.stderr)
+            return EXIT_USAGE
+
+    stream = sys.stdout
+    if args.output and args.format != 'parquet':
+        stream = open(args.output, 'w')
+
+    records = []
+    failed = False
+    try:
+        for file_path in args.files:
+            try:
+                record = analyze_record(file_path, metrics, args.mix, not args.no_cache)
+            except Exception as e:
+                record = {'file': file_path, 'error': str(e)}
+                failed = True
+
+            if args.format == 'ndjson':
+                # Stream each result as soon as it is ready
+                stream.write(json.dumps(record) + "\n")
+                stream.flush()
+            else:
+                records.append(record)
+
+        if args.format == 'json':
+            json.dump(records, stream, indent=2)
+            stream.write("\n")
+        elif args.format == 'parquet':
+            _write_parquet(records, args.output)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    return EXIT_FILE_ERRORS if failed else EXIT_OK
+
+
+def _format_summary(summary):
+    """One-line text summary of a per-file result."""
+    peak = summary['peak_frequency']
+    peak_text = f", peak {peak:.1f} Hz" if peak is not None else ""
+    cached_text = " ⚡" if summary['cached'] else ""
+    return (f"✅ {summary['file']}: {summary['duration']:.2f}s, "
+            f"RMS {summary['rms_db']:.2f} dB, "
+            f"range {summary['dynamic_range']:.2f} dB{peak_text}{cached_text}")
+
+
+def run_batch(args):
+    """Analyze a directory tree and print results as they finish."""
+    from .batch import analyze_directory, summarize_batch
+
+    if not os.path.isdir(args.directory):
+        print(f"❌ Not a directory: {args.directory}", file=sys.stderr)
+        return EXIT_USAGE
+
+    summaries = []
+    errors = 0
+    for file_path, summary, error in analyze_directory(
+            args.directory, workers=args.workers, mix=args.mix,
+            use_cache=not args.no_cache):
+        if error is None:
+            summaries.append(summary)
+            print(_format_summary(summary), flush=True)
+        else:
+            errors += 1
+            print(f"❌ {file_path}: {error}", flush=True)
+
+    combined = summarize_batch(summaries, errors)
+    print("\n📊 Batch Summary")
+    print("=" * 40)
+    print(f"📁 Files: {combined['files']} ({combined['succeeded']} analyzed, "
+          f"{combined['failed']} failed, {combined['cached']} cached)")
+    print(f"⏱️  Total Duration: {combined['total_duration']:.2f} seconds")
+    if summaries:
+        print(f"📊 Mean RMS dB: {combined['mean_rms_db']:.2f}")
+        print(f"🔊 Loudest: {combined['loudest']['file']} ({combined['loudest']['rms_db']:.2f} dB)")
+        print(f"🔈 Quietest: {combined['quietest']['file']} ({combined['quietest']['rms_db']:.2f} dB)")
+
+    return EXIT_FILE_ERRORS if errors else EXIT_OK
+
+
+def build_parser():
+    """Create the argument parser for all subcommands."""
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Sound Wave Analysis - non-interactive commands"
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analyze = subparsers.add_parser(
+        'analyze', help="Analyze WAV files and print machine-readable results")
+    analyze.add_argument('files', nargs='+', metavar='FILE', help="WAV files to analyze")
+    analyze.add_argument('--metrics', default=DEFAULT_METRICS,
+                         help=f"Comma-separated metrics from {','.join(METRICS)} "
+                              f"(default: {DEFAULT_METRICS})")
+    analyze.add_argument('--format', default='json', choices=['json', 'ndjson', 'parquet'],
+                         help="Output format (default: json)")
+    analyze.add_argument('-o', '--output', default=None,
+                         help="Write to this file instead of stdout")
+    analyze.add_argument('--mix', default='left',
+                         choices=['left', 'right', 'downmix', 'mid', 'side', 'all'],
+                         help="How multi-channel files are reduced (default: left)")
+    analyze.add_argument('--no-cache', action='store_true',
+                         help="Do not read or write the analysis cache")
+    analyze.set_defaults(handler=run_analyze)
+
+    batch = subparsers.add_parser(
+        'batch', help="Analyze every audio file under a directory tree")
+    batch.add_argument('directory', help="Directory to search recursively")
+    batch.add_argument('--workers', type=int, default=None,
+                       help="Worker processes (default: one per CPU)")
+    batch.add_argument('--mix', default='left',
+                       choices=['left', 'right', 'downmix', 'mid', 'side'],
+                       help="How multi-channel files are reduced (default: left)")
+    batch.add_argument('--no-cache', action='store_true',
+                       help="Do not read or write the analysis cache")
+    batch.set_defaults(handler=run_batch)
+
+    return parser
+
+
+def main(argv=None):
+    """Parse arguments, run the command and return its exit code."""
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
@@ -0,0 +1,134 @@
+"""
+Plot Decimation
+
+Peak-preserving reduction of long waveforms to a screen-sized number of
+points for plotting.
+"""
+
+import numpy as np
+
+
+# Horizontal bins a waveform plot is reduced to (about one per pixel column)
+PLOT_BINS = 2000
+
+
+def minmax_decimate(waveform, sample_rate, num_bins=PLOT_BINS):
+    """
+    Reduce a waveform to the minimum and maximum of each of `num_bins` bins.
+
+    The waveform is reshaped to (bins, samples per bin) and reduced with
+    argmin/argmax, so the cost is one vectorized pass and the output size
+    depends only on `num_bins`. Unlike taking every n-th sample, every
+    peak (and any clipping) survives. Each bin's two points are kept in
+    time order so the line follows the signal.
+
+    Args:
+        waveform: 1-D or (channels, samples) array
+        sample_rate: Samples per second
+        num_bins: Number of bins (output has at most 2 * num_bins points)
+
+    Returns:
+        (times, values): arrays of the same shape; times in seconds (per
+        channel for 2-D input, since each channel's extremes fall at
+        different samples) and the original sample values
+    """
+    waveform = np.asarray(waveform)
+    num_samples = waveform.shape[-1]
+    if num_samples <= 2 * num_bins:
+        indices = np.broadcast_to(np.arange(num_samples), waveform.shape)
+        return indices / sample_rate, waveform
+
+    bin_size = -(-num_samples // num_bins)
+    full_bins = num_samples // bin_size
+    blocks = waveform[..., :full_bins * bin_size].reshape(
+        waveform.shape[:-1] + (full_bins, bin_size))
+    starts = np.arange(full_bins) * bin_size
+    low = starts + blocks.argmin(axis=-1)
+    high = starts + blocks.argmax(axis=-1)
+
+    remainder = waveform[..., full_bins * bin_size:]
+    if remainder.shape[-1]:
+        offset = full_bins * bin_size
+        low = np.concatenate([low, offset + remainder.argmin(axis=-1)[..., None]], axis=-1)
+        high = np.concatenate([high, offset + remainder.argmax(axis=-1)[..., None]], axis=-1)
+
+    indices = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=-1)
+    indices = indices.reshape(waveform.shape[:-1] + (-1,))
+    return indices / sample_rate, np.take_along_axis(waveform, indices, axis=-1)
+
+
+# Pixel grid a spectrogram heatmap is pooled to: time columns, frequency rows
+SPECTROGRAM_TIME_BINS = 1000
+SPECTROGRAM_FREQ_BINS = 256
+
+# Lowest frequency on the log-frequency axis in Hz
+SPECTROGRAM_F_MIN = 20.0
+
+
+def pool_segments(values, starts, axis, reducer):
+    """Reduce contiguous segments beginning at `starts` along `axis` ('max' or 'mean')."""
+    if reducer == 'max':
+        return np.maximum.reduceat(values, starts, axis=axis)
+    if reducer == 'mean':
+        counts = np.diff(np.append(starts, values.shape[axis]))
+        shape = [1] * values.ndim
+        shape[axis] = -1
+        return np.add.reduceat(values, starts, axis=axis) / counts.reshape(shape)
+    raise ValueError(f"Unknown reducer '{reducer}'. Use 'max' or 'mean'")
+
+
+def pool_spectrogram(times, freqs, power, time_bins=SPECTROGRAM_TIME_BINS,
+                     freq_bins=SPECTROGRAM_FREQ_BINS, f_min=SPECTROGRAM_F_MIN, f_max=None,
+                     reducer='max'):
+    """
+    Pool a spectrogram to a fixed grid in time and log-frequency.
+
+    Frames are grouped into at most `time_bins` columns and FFT bins into
+    `freq_bins` log-spaced rows, each reduced with reduceat, so the output
+    size depends only on the grid. 'max' keeps short events and narrow
+    tones visible; 'mean' preserves average power. Rows narrower than the
+    FFT bin spacing (at low frequencies) take the nearest bin.
+
+    Args:
+        times: Frame times in seconds
+        freqs: Bin frequencies in Hz (ascending)
+        power: (bins, frames) power array (not dB, so pooling is in power)
+        time_bins: Most output columns
+        freq_bins: Output rows
+        f_min, f_max: Frequency range of the rows (f_max defaults to the top bin)
+        reducer: 'max' or 'mean'
+
+    Returns a dictionary with 'times' (column centres), 'freqs' (row
+    centres, geometric) and 'power' (freq_bins x columns).
+    """
+    times = np.asarray(times, dtype=np.float64)
+    freqs = np.asarray(freqs, dtype=np.float64)
+    power = np.asarray(power)
+
+    num_frames = power.shape[1]
+    if num_frames > time_bins:
+        starts = np.unique(np.linspace(0, num_frames, time_bins, endpoint=False).astype(int))
+        power = pool_segments(power, starts, 1, reducer)
+        times = pool_segments(times, starts, 0, 'mean')
+
+    f_max = freqs[-1] if f_max is None else min(f_max, freqs[-1])
+    f_min = min(max(f_min, freqs[1] if len(freqs) > 1 else freqs[0]), f_max / 2)
+    edges = np.geomspace(f_min, f_max, freq_bins + 1)
+
+    # Rows containing FFT bins reduce them; rows narrower than the bin
+    # spacing (low frequencies) take the bin nearest their centre
+    centres = np.sqrt(edges[:-1] * edges[1:])
+    lower = np.searchsorted(freqs, edges[:-1])
+    upper = np.searchsorted(freqs, edges[1:])
+    filled = upper > lower
+    nearest = np.clip(np.searchsorted(freqs, centres), 1, len(freqs) - 1)
+    nearest -= centres - freqs[nearest - 1] < freqs[nearest] - centres
+    pooled = power[nearest].astype(np.float64)
+    if filled.any():
+        pooled[filled] = pool_segments(power[:upper[filled][-1]], lower[filled], 0, reducer)
+
+    return {
+        'times': times,
+        'freqs': centres,
+        'power': pooled
+    }
@@ -0,0 +1,149 @@
+"""
+Pitch Tracking
+
+Framewise fundamental-frequency (f0) estimation with the YIN algorithm,
+vectorized across frames.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Default analysis frame and hop in samples
+PITCH_FRAME_SIZE = 2048
+PITCH_HOP_SIZE = 512
+
+# Search range for the fundamental in Hz
+PITCH_F_MIN = 50.0
+PITCH_F_MAX = 2000.0
+
+# YIN aperiodicity threshold: frames whose best dip is above it are unvoiced
+YIN_THRESHOLD = 0.15
+
+# Approximate samples processed at once (bounds the FFT temporaries)
+PITCH_BLOCK_SIZE = 1 << 20
+
+
+def _yin_difference(frames, max_lag):
+    """
+    YIN difference function d(tau) for tau in [0, max_lag] of every frame.
+
+    Uses d(tau) = E(0..W-tau) + E(tau..W) - 2 r(tau), with the
+    autocorrelation r computed for all frames in one batched FFT.
+    """
+    from scipy.fft import next_fast_len
+
+    frame_size = frames.shape[-1]
+    # Lags up to max_lag only need that much zero padding to avoid wrap-around
+    n_fft = next_fast_len(frame_size + max_lag, real=True)
+    spectrum = np.fft.rfft(frames, n=n_fft)
+    autocorr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft)[:, :max_lag + 1]
+
+    energy = np.concatenate(
+        [np.zeros((len(frames), 1)), np.cumsum(frames * frames, axis=-1)], axis=-1)
+    lags = np.arange(max_lag + 1)
+    head = energy[:, frame_size - lags]                      # x[0 .. W-tau)
+    tail = energy[:, frame_size:frame_size + 1] - energy[:, lags]  # x[tau .. W)
+    return np.maximum(head + tail - 2 * autocorr, 0)
+
+
+def _yin_pick(difference, min_lag, threshold):
+    """Choose each frame's period from its difference function; returns (lag, aperiodicity)."""
+    num_frames, num_lags = difference.shape
+    lags = np.arange(num_lags)
+
+    # Cumulative mean normalized difference d'(tau); d'(0) = 1
+    cumulative = np.cumsum(difference[:, 1:], axis=-1)
+    normalized = np.ones_like(difference)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized[:, 1:] = np.where(cumulative > 0, difference[:, 1:] * lags[1:] / cumulative, 1.0)
+    normalized[:, :min_lag] = np.inf
+
+    # First dip below the threshold, followed down to its local minimum;
+    # frames without one fall back to the global minimum
+    below = normalized < threshold
+    has_dip = below.any(axis=-1)
+    first = np.where(has_dip, below.argmax(axis=-1), normalized.argmin(axis=-1))
+    rising = np.append(normalized[:, 1:] >= normalized[:, :-1],
+                       np.ones((num_frames, 1), dtype=bool), axis=-1)
+    lag = np.where(has_dip, (rising & (lags >= first[:, None])).argmax(axis=-1), first)
+
+    # Parabolic interpolation of the dip for a sub-sample period
+    rows = np.arange(num_frames)
+    inner = (lag > min_lag) & (lag < num_lags - 1)
+    left = normalized[rows, np.where(inner, lag - 1, lag)]
+    centre = normalized[rows, lag]
+    right = normalized[rows, np.where(inner, lag + 1, lag)]
+    curvature = left - 2 * centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(inner & (curvature > 0), 0.5 * (left - right) / curvature, 0.0)
+
+    return lag + offset, centre
+
+
+def track_pitch(waveform, sample_rate, frame_size=PITCH_FRAME_SIZE, hop_size=PITCH_HOP_SIZE,
+                f_min=PITCH_F_MIN, f_max=PITCH_F_MAX, threshold=YIN_THRESHOLD,
+                block_size=PITCH_BLOCK_SIZE):
+    """
+    Track the fundamental frequency over time with YIN.
+
+    Args:
+        waveform: 1-D array, or (channels, samples) which is downmixed
+        sample_rate: Samples per second
+        frame_size: Samples per analysis frame (must hold two periods of f_min)
+        hop_size: Samples between frame starts
+        f_min, f_max: Search range for f0 in Hz
+        threshold: Aperiodicity above which a frame counts as unvoiced
+        block_size: Approximate samples processed at once
+
+    Frames are strided views of the waveform; the difference function
+    of a whole group of frames comes from one batched FFT, so there is
+    no per-frame Python loop.
+
+    Returns a dictionary with:
+        times: Frame centre times in seconds
+        f0: Fundamental frequency per frame in Hz (NaN when unvoiced)
+        confidence: 1 - aperiodicity, in [0, 1]
+        voiced: Boolean per frame
+        frame_size, hop_size: Frame parameters used
+    """
+    waveform = np.asarray(waveform)
+    if waveform.ndim > 1:
+        waveform = waveform.mean(axis=0, dtype=np.float64)
+    num_samples = len(waveform)
+    frame_size = max(4, min(frame_size, num_samples))
+    hop_size = max(1, hop_size)
+
+    # Lags covering the f0 range; the longest period must fit in half a frame
+    min_lag = max(2, int(np.floor(sample_rate / f_max)))
+    max_lag = min(int(np.ceil(sample_rate / f_min)), frame_size // 2)
+
+    num_frames = 1 + (num_samples - frame_size) // hop_size if num_samples >= frame_size else 0
+    f0 = np.full(num_frames, np.nan)
+    confidence = np.zeros(num_frames)
+    voiced = np.zeros(num_frames, dtype=bool)
+
+    frames_per_block = max(1, block_size // max(hop_size, frame_size))
+    for first in range(0, num_frames if min_lag < max_lag else 0, frames_per_block):
+        last = min(first + frames_per_block, num_frames)
+        segment = np.asarray(
+            waveform[first * hop_size:(last - 1) * hop_size + frame_size], dtype=np.float64)
+        frames = sliding_window_view(segment, frame_size)[::hop_size]
+        frames = frames - frames.mean(axis=-1, keepdims=True)
+
+        lag, aperiodicity = _yin_pick(_yin_difference(frames, max_lag), min_lag, threshold)
+        is_voiced = aperiodicity < threshold
+        voiced[first:last] = is_voiced
+        confidence[first:last] = np.clip(1 - aperiodicity, 0, 1)
+        f0[first:last] = np.where(is_voiced, sample_rate / lag, np.nan)
+
+    times = (np.arange(num_frames) * hop_size + frame_size / 2) / sample_rate
+
+    return {
+        'times': times,
+        'f0': f0,
+        'confidence': confidence,
+        'voiced': voiced,
+        'frame_size': frame_size,
+        'hop_size': hop_size
+    }
@@ -7,7 +7,12 @@ Publication-quality interactive graphs for physics professionals.
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from scipy import signal
+from .spectral import compute_spectrum, compute_psd, smooth_spectrum
+from .stft import STFT_WINDOW_SIZE, compute_stft
+from .decimation import minmax_decimate, pool_spectrogram
+from .levels import compute_level_envelope
+from .pitch import PITCH_HOP_SIZE, track_pitch
+from .pyramid import query_pyramid, query_spectrogram
 
 
 # Professional color scheme
@@ -32,8 +37,66 @@ LAYOUT_DEFAULTS = {
     'hovermode': 'x unified'
 }
 
+# Trace colors for multi-channel plots
+CHANNEL_COLORS = [
+    COLORS['primary'], COLORS['accent'], COLORS['warning'], COLORS['success'],
+    COLORS['secondary'], '#ef4444', '#ec4899', '#84cc16'
+]
 
-def create_waveform_plot(waveform, sample_rate, duration, title="Waveform"):
+
+def _iter_channels(data, name, color):
+    """
+    Yield (name, color, values) for each channel to plot.
+    
+    1-D data is a single trace with the given name and color; each row of
+    (channels, samples) data gets its own label and color.
+    """
+    if np.ndim(data) == 1:
+        yield name, color, data
+        return
+    
+    for index, values in enumerate(data):
+        label = ('Left', 'Right')[index] if len(data) == 2 else f'Channel {index + 1}'
+        yield label, CHANNEL_COLORS[index % len(CHANNEL_COLORS)], values
+
+
+def _add_envelope_traces(fig, envelope):
+    """Overlay a compute_level_envelope() result as ±RMS bands and peak lines."""
+    times = envelope['times']
+    peaks = np.atleast_2d(envelope['peak'])
+    rms_dbfs = np.atleast_2d(envelope['rms_dbfs'])
+    peak_dbfs = np.atleast_2d(envelope['peak_dbfs'])
+    
+    for index, (name, color, rms) in enumerate(
+            _iter_channels(envelope['rms'], '', COLORS['warning'])):
+        label = f'{name} ' if name else ''
+        level_text = np.char.add(
+            np.char.mod('RMS %.1f dBFS<br>Peak ', rms_dbfs[index]),
+            np.char.mod('%.1f dBFS', peak_dbfs[index])
+        )
+        
+        fig.add_trace(go.Scatter(
+            x=times, y=peaks[index], mode='lines',
+            line=dict(color=color, width=1, dash='dot'),
+            name=f'{label}Peak', legendgroup=f'{label}envelope',
+            hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=times, y=-rms, mode='lines',
+            line=dict(color=color, width=1),
+            name=f'{label}RMS', legendgroup=f'{label}envelope',
+            showlegend=False, hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=times, y=rms, mode='lines', fill='tonexty',
+            line=dict(color=color, width=1),
+            name=f'{label}RMS', legendgroup=f'{label}envelope',
+            text=level_text,
+            hovertemplate='%{text}<extra></extra>'
+        ))
+
+
+def create_waveform_plot(waveform, sample_rate, duration, title="Waveform", envelope=None):
     """
     Create an interactive waveform plot.
     
@@ -41,26 +104,33 @@ def create_waveform_plot(waveform, sample_rate, duration, title="Waveform"):
     - Transients and attack characteristics
     - Envelope shape
     - Clipping
-    """
-    time = np.linspace(0, duration, num=len(waveform))
     
-    # Downsample for performance if too many points
-    max_points = 50000
-    if len(waveform) > max_points:
-        step = len(waveform) // max_points
-        time = time[::step]
-        waveform = waveform[::step]
+    A (channels, samples) array is drawn as one trace per channel.
+    Pass an `envelope` from levels.compute_level_envelope() to overlay
+    the short-time RMS and peak levels.
+    
+    Long waveforms are reduced to per-bin minima and maxima
+    (decimation.minmax_decimate), so the point count is bounded by the
+    plot width and peaks are never dropped.
+    """
+    times, waveform = minmax_decimate(waveform, sample_rate)
+    times = np.reshape(times, (-1, times.shape[-1]))
     
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=time,
-        y=waveform,
-        mode='lines',
-        line=dict(color=COLORS['primary'], width=0.5),
-        name='Amplitude',
-        hovertemplate='Time: %{x:.4f}s<br>Amplitude: %{y:,.0f}<extra></extra>'
-    ))
+    for index, (name, color, values) in enumerate(
+            _iter_channels(waveform, 'Amplitude', COLORS['primary'])):
+        fig.add_trace(go.Scatter(
+            x=times[index],
+            y=values,
+            mode='lines',
+            line=dict(color=color, width=0.5),
+            name=name,
+            hovertemplate='Time: %{x:.4f}s<br>Amplitude: %{y:,.0f}<extra></extra>'
+        ))
+    
+    if envelope is not None:
+        _add_envelope_traces(fig, envelope)
     
     fig.update_layout(
         title=dict(text=f'<b>{title}</b>', font=dict(size=16)),
@@ -84,44 +154,100 @@ def create_waveform_plot(waveform, sample_rate, duration, title="Waveform"):
     return fig
 
 
-def create_frequency_spectrum_plot(waveform, sample_rate, title="Frequency Spectrum"):
+def create_zoomed_waveform_plot(pyramid, start_time=0.0, end_time=None, title="Waveform Detail"):
+    """
+    Draw a time range of a waveform from its overview pyramid.
+    
+    The min/max range of each block is drawn as a filled band with the
+    RMS level inside it. Data comes from pyramid.query_pyramid(), so any
+    zoom range costs the same regardless of file length.
+    """
+    overview = query_pyramid(pyramid, start_time, end_time)
+    times = overview['times']
+    
+    fig = go.Figure()
+    
+    channels = zip(_iter_channels(overview['max'], 'Amplitude', COLORS['primary']),
+                   np.reshape(overview['min'], (-1, len(times))),
+                   np.reshape(overview['rms'], (-1, len(times))))
+    for (name, color, maximum), minimum, rms in channels:
+        fig.add_trace(go.Scatter(
+            x=times, y=minimum, mode='lines', line=dict(color=color, width=0.5),
+            name=name, legendgroup=name, showlegend=False, hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=times, y=maximum, mode='lines', fill='tonexty',
+            line=dict(color=color, width=0.5),
+            name=name, legendgroup=name,
+            customdata=minimum,
+            hovertemplate='Time: %{x:.4f}s<br>Max: %{y:,.0f}<br>Min: %{customdata:,.0f}<extra></extra>'
+        ))
+        fig.add_trace(go.Scatter(
+            x=times, y=rms, mode='lines',
+            line=dict(color=COLORS['warning'], width=1),
+            name=f'{name} RMS', legendgroup=name,
+            hovertemplate='RMS: %{y:,.0f}<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title=dict(text=f'<b>{title}</b>', font=dict(size=16)),
+        xaxis=dict(
+            title=f"Time (seconds) · {overview['block_size']} samples/point",
+            gridcolor=COLORS['grid'],
+            showgrid=True
+        ),
+        yaxis=dict(
+            title='Amplitude',
+            gridcolor=COLORS['grid'],
+            showgrid=True,
+            zeroline=True,
+            zerolinecolor=COLORS['accent']
+        ),
+        **LAYOUT_DEFAULTS
+    )
+    
+    return fig
+
+
+def create_frequency_spectrum_plot(waveform, sample_rate, title="Frequency Spectrum", spectrum=None,
+                                   smoothing=6):
     """
     Create a frequency spectrum plot styled like Audacity's Frequency Analysis.
     
     Shows magnitude in dB vs frequency on a log scale.
     Matches Audacity's display with clear dB and Hz labels.
+    Pass a precomputed `spectrum` from compute_spectrum() to skip the FFT.
+    Long spectra are smoothed to 1/`smoothing` octave (None to disable).
     """
-    # Compute FFT
-    fft = np.fft.fft(waveform)
-    freqs = np.fft.fftfreq(len(fft), 1/sample_rate)
-    magnitude = np.abs(fft)
+    if spectrum is None:
+        spectrum = compute_spectrum(waveform, sample_rate)
     
-    # Only positive frequencies
-    positive_mask = freqs > 0
-    freqs = freqs[positive_mask]
-    magnitude = magnitude[positive_mask]
+    freqs = spectrum['freqs']
     
-    # Convert to dB (relative to max, like Audacity)
-    magnitude_db = 20 * np.log10(magnitude / magnitude.max() + 1e-10)
+    # dB relative to max, like Audacity
+    magnitude_db = spectrum['magnitude_db']
     
-    # Smooth for cleaner display (like Audacity's smoothing)
-    if len(magnitude_db) > 2000:
-        window_size = len(magnitude_db) // 1000
-        magnitude_db = np.convolve(magnitude_db, np.ones(window_size)/window_size, mode='same')
+    # Smooth for cleaner display (like Audacity's smoothing); this also
+    # reduces the trace to a fixed number of points per octave
+    if smoothing and len(freqs) > 2000:
+        smoothed = smooth_spectrum(freqs, spectrum['magnitude'], smoothing)
+        freqs = smoothed['freqs']
+        magnitude_db = smoothed['magnitude_db']
     
     fig = go.Figure()
     
-    # Filled area plot like Audacity
-    fig.add_trace(go.Scatter(
-        x=freqs,
-        y=magnitude_db,
-        mode='lines',
-        fill='tozeroy',
-        fillcolor='rgba(138, 43, 226, 0.5)',  # Purple like Audacity
-        line=dict(color='#8B2BE2', width=1),
-        name='Level',
-        hovertemplate='<b>%{x:.1f} Hz</b><br>%{y:.1f} dB<extra></extra>'
-    ))
+    for name, color, level_db in _iter_channels(magnitude_db, 'Level', '#8B2BE2'):
+        # Filled area plot like Audacity (purple for a single channel)
+        fig.add_trace(go.Scatter(
+            x=freqs,
+            y=level_db,
+            mode='lines',
+            fill='tozeroy',
+            fillcolor='rgba(138, 43, 226, 0.5)' if np.ndim(magnitude_db) == 1 else None,
+            line=dict(color=color, width=1),
+            name=name,
+            hovertemplate='<b>%{x:.1f} Hz</b><br>%{y:.1f} dB<extra></extra>'
+        ))
     
     # Create frequency tick values for log scale (like Audacity)
     freq_ticks = [20, 50, 100, 200, 500, 1000, 2000, 5000]
@@ -173,7 +299,8 @@ def create_frequency_spectrum_plot(waveform, sample_rate, title="Frequency Spect
     return fig
 
 
-def create_spectrogram_plot(waveform, sample_rate, title="Spectrogram"):
+def create_spectrogram_plot(waveform, sample_rate, title="Spectrogram", pitch=None,
+                            stft=None, max_freq=8000, reducer='max'):
     """
     Create a time-frequency spectrogram.
     
@@ -182,25 +309,79 @@ def create_spectrogram_plot(waveform, sample_rate, title="Spectrogram"):
     - Tracking pitch changes
     - Identifying frequency modulation
     - Visualizing speech/music structure
+    
+    Multi-channel input is downmixed to a single spectrogram. Pass a
+    `pitch` track from pitch.track_pitch() to overlay the fundamental,
+    and a precomputed `stft` from stft.compute_stft() to choose the
+    window settings (defaults otherwise). Only bins up to `max_freq` are
+    drawn, pooled (`reducer` 'max' or 'mean') to a fixed time by
+    log-frequency grid so the figure size does not grow with duration.
     """
-    # Compute spectrogram
-    nperseg = min(1024, len(waveform) // 8)
-    frequencies, times, Sxx = signal.spectrogram(
-        waveform, 
-        fs=sample_rate, 
-        nperseg=nperseg,
-        noverlap=nperseg // 2
+    if stft is None:
+        stft = compute_stft(waveform, sample_rate,
+                            window_size=min(STFT_WINDOW_SIZE, max(2, np.shape(waveform)[-1] // 8)))
+    
+    # Display-only pooling: the cached transform is left untouched
+    max_freq = min(max_freq, sample_rate / 2)
+    grid = pool_spectrogram(stft['times'], stft['freqs'], stft['power'],
+                            f_max=max_freq, reducer=reducer)
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Heatmap(
+        x=grid['times'],
+        y=grid['freqs'],
+        z=10 * np.log10(grid['power'] + 1e-10),
+        colorscale='Viridis',
+        colorbar=dict(title='dB', title_side='right'),
+        hovertemplate='Time: %{x:.3f}s<br>Freq: %{y:.0f} Hz<br>Power: %{z:.1f} dB<extra></extra>'
+    ))
+    
+    if pitch is not None:
+        # Unvoiced frames are NaN, which leaves gaps in the line
+        fig.add_trace(go.Scatter(
+            x=pitch['times'],
+            y=pitch['f0'],
+            mode='lines',
+            name='f0',
+            line=dict(color=COLORS['warning'], width=2),
+            customdata=pitch['confidence'],
+            hovertemplate='Time: %{x:.3f}s<br>f0: %{y:.1f} Hz<br>Confidence: %{customdata:.2f}<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title=dict(text=f'<b>{title}</b>', font=dict(size=16)),
+        showlegend=False,
+        xaxis=dict(
+            title='Time (seconds)',
+            gridcolor=COLORS['grid']
+        ),
+        yaxis=dict(
+            title='Frequency (Hz)',
+            gridcolor=COLORS['grid'],
+            type='log',
+            range=np.log10([grid['freqs'][0], grid['freqs'][-1]]).tolist()
+        ),
+        **LAYOUT_DEFAULTS
     )
     
-    # Convert to dB
-    Sxx_db = 10 * np.log10(Sxx + 1e-10)
+    return fig
+
+
+def create_zoomed_spectrogram_plot(pyramid, start_time=0.0, end_time=None,
+                                   title="Spectrogram Detail"):
+    """Draw a time range of the spectrogram stored in an overview pyramid."""
+    tile = query_spectrogram(pyramid, start_time, end_time)
+    # Max-pooling commutes with the dB conversion, so the tile can be pooled as is
+    grid = pool_spectrogram(tile['times'], tile['freqs'], tile['power_db'],
+                            f_max=min(8000, pyramid['sample_rate'] / 2))
     
     fig = go.Figure()
     
     fig.add_trace(go.Heatmap(
-        x=times,
-        y=frequencies,
-        z=Sxx_db,
+        x=grid['times'],
+        y=grid['freqs'],
+        z=grid['power'],
         colorscale='Viridis',
         colorbar=dict(title='dB', title_side='right'),
         hovertemplate='Time: %{x:.3f}s<br>Freq: %{y:.0f} Hz<br>Power: %{z:.1f} dB<extra></extra>'
@@ -215,7 +396,8 @@ def create_spectrogram_plot(waveform, sample_rate, title="Spectrogram"):
         yaxis=dict(
             title='Frequency (Hz)',
             gridcolor=COLORS['grid'],
-            range=[0, min(8000, sample_rate/2)]  # Cap at 8kHz for visibility
+            type='log',
+            range=np.log10([grid['freqs'][0], grid['freqs'][-1]]).tolist()
         ),
         **LAYOUT_DEFAULTS
     )
@@ -233,23 +415,23 @@ def create_psd_plot(waveform, sample_rate, title="Power Spectral Density"):
     - Noise characterization
     - Comparing signal strengths
     """
-    frequencies, psd = signal.welch(waveform, fs=sample_rate, nperseg=min(1024, len(waveform)//4))
-    
-    # Convert to dB
-    psd_db = 10 * np.log10(psd + 1e-10)
+    psd = compute_psd(waveform, sample_rate)
+    frequencies = psd['freqs']
+    psd_db = psd['psd_db']
     
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=frequencies,
-        y=psd_db,
-        mode='lines',
-        fill='tozeroy',
-        fillcolor='rgba(6, 182, 212, 0.3)',
-        line=dict(color=COLORS['accent'], width=1.5),
-        name='PSD',
-        hovertemplate='Frequency: %{x:.1f} Hz<br>Power: %{y:.1f} dB/Hz<extra></extra>'
-    ))
+    for name, color, values in _iter_channels(psd_db, 'PSD', COLORS['accent']):
+        fig.add_trace(go.Scatter(
+            x=frequencies,
+            y=values,
+            mode='lines',
+            fill='tozeroy',
+            fillcolor='rgba(6, 182, 212, 0.3)' if np.ndim(psd_db) == 1 else None,
+            line=dict(color=color, width=1.5),
+            name=name,
+            hovertemplate='Frequency: %{x:.1f} Hz<br>Power: %{y:.1f} dB/Hz<extra></extra>'
+        ))
     
     fig.update_layout(
         title=dict(text=f'<b>{title}</b>', font=dict(size=16)),
@@ -270,7 +452,7 @@ def create_psd_plot(waveform, sample_rate, title="Power Spectral Density"):
     return fig
 
 
-def create_phase_plot(waveform, sample_rate, title="Phase Response"):
+def create_phase_plot(waveform, sample_rate, title="Phase Response", spectrum=None):
     """
     Create a phase response plot.
     
@@ -279,32 +461,32 @@ def create_phase_plot(waveform, sample_rate, title="Phase Response"):
     - Phase relationship analysis
     - Filter characterization
     - Signal processing validation
+    
+    Pass a precomputed `spectrum` from compute_spectrum() to skip the FFT.
     """
-    fft = np.fft.fft(waveform)
-    freqs = np.fft.fftfreq(len(fft), 1/sample_rate)
-    phase = np.angle(fft, deg=True)
+    if spectrum is None:
+        spectrum = compute_spectrum(waveform, sample_rate)
     
-    # Only positive frequencies
-    positive_mask = freqs > 0
-    freqs = freqs[positive_mask]
-    phase = phase[positive_mask]
+    freqs = spectrum['freqs']
+    phase = spectrum['phase']
     
     # Subsample for performance
     if len(freqs) > 5000:
         step = len(freqs) // 5000
         freqs = freqs[::step]
-        phase = phase[::step]
+        phase = phase[..., ::step]
     
     fig = go.Figure()
     
-    fig.add_trace(go.Scatter(
-        x=freqs,
-        y=phase,
-        mode='markers',
-        marker=dict(color=COLORS['secondary'], size=2, opacity=0.5),
-        name='Phase',
-        hovertemplate='Frequency: %{x:.1f} Hz<br>Phase: %{y:.1f}°<extra></extra>'
-    ))
+    for name, color, values in _iter_channels(phase, 'Phase', COLORS['secondary']):
+        fig.add_trace(go.Scatter(
+            x=freqs,
+            y=values,
+            mode='markers',
+            marker=dict(color=color, size=2, opacity=0.5),
+            name=name,
+            hovertemplate='Frequency: %{x:.1f} Hz<br>Phase: %{y:.1f}°<extra></extra>'
+        ))
     
     fig.update_layout(
         title=dict(text=f'<b>{title}</b>', font=dict(size=16)),
@@ -335,22 +517,26 @@ def create_histogram_plot(waveform, title="Amplitude Distribution"):
     - Dynamic range analysis
     - Clipping detection
     - Signal statistics
+    
+    A (channels, samples) array is drawn as overlaid per-channel histograms.
     """
     fig = go.Figure()
     
-    fig.add_trace(go.Histogram(
-        x=waveform,
-        nbinsx=100,
-        marker=dict(
-            color=COLORS['success'],
-            line=dict(color=COLORS['text'], width=0.5)
-        ),
-        opacity=0.8,
-        name='Distribution',
-        hovertemplate='Amplitude: %{x:,.0f}<br>Count: %{y:,}<extra></extra>'
-    ))
+    for name, color, values in _iter_channels(waveform, 'Distribution', COLORS['success']):
+        fig.add_trace(go.Histogram(
+            x=values,
+            nbinsx=100,
+            marker=dict(
+                color=color,
+                line=dict(color=COLORS['text'], width=0.5)
+            ),
+            opacity=0.8 if np.ndim(waveform) == 1 else 0.5,
+            name=name,
+            hovertemplate='Amplitude: %{x:,.0f}<br>Count: %{y:,}<extra></extra>'
+        ))
     
     fig.update_layout(
+        barmode='overlay',
         title=dict(text=f'<b>{title}</b>', font=dict(size=16)),
         xaxis=dict(
             title='Amplitude',
@@ -368,24 +554,44 @@ def create_histogram_plot(waveform, title="Amplitude Distribution"):
     return fig
 
 
-def create_all_visualizations(waveform, sample_rate, duration, filename="Audio"):
+def overview_pitch_track(waveform, sample_rate):
+    """Pitch track with at most ~2000 frames, for the spectrogram overlay."""
+    return track_pitch(waveform, sample_rate,
+                       hop_size=max(PITCH_HOP_SIZE, np.shape(waveform)[-1] // 2000))
+
+
+def create_all_visualizations(waveform, sample_rate, duration, filename="Audio", spectrum=None,
+                              stft=None, pitch=None, spectrogram=True):
     """
     Generate all 6 professional visualizations.
     
+    The FFT is computed once and shared by the spectrum and phase plots;
+    pass `spectrum` to reuse one already computed for harmonic detection.
+    Pass `stft` (stft.compute_stft) and `pitch` (pitch.track_pitch) to
+    reuse those for the spectrogram, or spectrogram=False to leave it out
+    when the caller draws it separately. A (channels, samples) array
+    produces per-channel traces.
+    
     Returns a dictionary of Plotly figures.
     """
-    return {
+    if spectrum is None:
+        spectrum = compute_spectrum(waveform, sample_rate)
+    
+    # Level envelope with at most ~5000 frames for the waveform overlay
+    hop_size = max(1024, np.shape(waveform)[-1] // 5000)
+    envelope = compute_level_envelope(waveform, sample_rate,
+                                      window_size=2 * hop_size, hop_size=hop_size)
+    
+    figures = {
         'waveform': create_waveform_plot(
             waveform, sample_rate, duration, 
-            f"Waveform - {filename}"
+            f"Waveform - {filename}",
+            envelope=envelope
         ),
         'spectrum': create_frequency_spectrum_plot(
             waveform, sample_rate,
-            f"Frequency Spectrum - {filename}"
-        ),
-        'spectrogram': create_spectrogram_plot(
-            waveform, sample_rate,
-            f"Spectrogram - {filename}"
+            f"Frequency Spectrum - {filename}",
+            spectrum=spectrum
         ),
         'psd': create_psd_plot(
             waveform, sample_rate,
@@ -393,10 +599,23 @@ def create_all_visualizations(waveform, sample_rate, duration, filename="Audio")
         ),
         'phase': create_phase_plot(
             waveform, sample_rate,
-            f"Phase Response - {filename}"
+            f"Phase Response - {filename}",
+            spectrum=spectrum
         ),
         'histogram': create_histogram_plot(
             waveform,
             f"Amplitude Distribution - {filename}"
         )
     }
+    
+    if spectrogram:
+        if pitch is None:
+            pitch = overview_pitch_track(waveform, sample_rate)
+        figures['spectrogram'] = create_spectrogram_plot(
+            waveform, sample_rate,
+            f"Spectrogram - {filename}",
+            pitch=pitch,
+            stft=stft
+        )
+    
+    return figures
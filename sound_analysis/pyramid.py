@@ -0,0 +1,239 @@
+"""
+Multi-Resolution Overview Pyramid
+
+Precomputed waveform (min/max/RMS) and spectrogram summaries at
+successive power-of-two resolutions, like the waveform overviews a DAW
+caches, so any zoom range can be drawn from a small slice of the right
+level instead of the full signal.
+"""
+
+import numpy as np
+from .decimation import PLOT_BINS
+from .stft import compute_stft
+
+
+# Samples per block at the finest waveform level
+PYRAMID_BASE_BLOCK = 256
+
+# Samples converted to float64 at once while building level 0
+PYRAMID_CHUNK_SIZE = 1 << 20
+
+# Spectrogram frame length and cap on the finest level's frame count
+PYRAMID_SPEC_FRAME_SIZE = 1024
+PYRAMID_SPEC_MAX_FRAMES = 8192
+
+
+def _halve(level, reducer):
+    """Combine neighbouring pairs of blocks along the last axis (odd tail kept)."""
+    length = level.shape[-1]
+    if length % 2:
+        pad = reducer.identity if reducer.identity is not None else level[..., -1:]
+        level = np.concatenate([level, np.broadcast_to(pad, level.shape[:-1] + (1,))], axis=-1)
+    return reducer.reduce(level.reshape(level.shape[:-1] + (-1, 2)), axis=-1)
+
+
+def _waveform_levels(waveform, base_block, chunk_size):
+    """Per-block min, max and sum of squares at every power-of-two level."""
+    num_samples = waveform.shape[-1]
+    num_blocks = -(-num_samples // base_block)
+    shape = waveform.shape[:-1] + (num_blocks,)
+    minimum = np.empty(shape)
+    maximum = np.empty(shape)
+    sum_squares = np.empty(shape)
+
+    step = max(1, chunk_size // base_block) * base_block
+    for start in range(0, num_samples, step):
+        chunk = np.asarray(waveform[..., start:start + step], dtype=np.float64)
+        length = chunk.shape[-1]
+        if length % base_block:
+            # Pad the final partial block with its own last sample (neutral
+            # for min/max); the padding's energy is removed below
+            pad = base_block - length % base_block
+            chunk = np.concatenate(
+                [chunk, np.repeat(chunk[..., -1:], pad, axis=-1)], axis=-1)
+        blocks = chunk.reshape(chunk.shape[:-1] + (-1, base_block))
+        first = start // base_block
+        last = first + blocks.shape[-2]
+        minimum[..., first:last] = blocks.min(axis=-1)
+        maximum[..., first:last] = blocks.max(axis=-1)
+        sum_squares[..., first:last] = np.einsum('...ij,...ij->...i', blocks, blocks)
+        if length % base_block:
+            sum_squares[..., last - 1] -= pad * chunk[..., -1] ** 2
+
+    levels = []
+    block_size = base_block
+    while True:
+        levels.append({
+            'block_size': block_size,
+            'min': minimum,
+            'max': maximum,
+            'sum_squares': sum_squares
+        })
+        if minimum.shape[-1] <= 1:
+            return levels
+        minimum = _halve(minimum, np.minimum)
+        maximum = _halve(maximum, np.maximum)
+        sum_squares = _halve(sum_squares, np.add)
+        block_size *= 2
+
+
+def _spectrogram_levels(waveform, sample_rate, frame_size, max_frames):
+    """STFT power spectrogram, pooled by pairs of frames per level."""
+    # Frames cover every sample; long files are mean-pooled to the cap
+    stft = compute_stft(waveform, sample_rate, window_size=frame_size,
+                        max_frames=max_frames, max_cells=None, pool='mean')
+    power = stft['power']
+    frame_size = stft['window_size']
+    frame_hop = stft['hop_size'] // stft['frames_per_column']
+    num_samples = waveform.shape[-1]
+    num_frames = 1 + (num_samples - frame_size) // frame_hop if num_samples >= frame_size else 0
+
+    levels = []
+    hop_size = stft['hop_size']
+    while True:
+        levels.append({'hop_size': hop_size, 'power': power})
+        if power.shape[-1] <= 1:
+            break
+        if power.shape[-1] % 2:
+            # An odd last column is paired with itself, so it keeps its value
+            power = np.concatenate([power, power[:, -1:]], axis=-1)
+        power = (power[:, 0::2] + power[:, 1::2]) / 2
+        hop_size *= 2
+
+    return {
+        'freqs': stft['freqs'],
+        'frame_size': frame_size,
+        'frame_hop': frame_hop,
+        'num_frames': num_frames,
+        'levels': levels
+    }
+
+
+def build_pyramid(waveform, sample_rate, base_block=PYRAMID_BASE_BLOCK, spectrogram=True,
+                  spec_frame_size=PYRAMID_SPEC_FRAME_SIZE,
+                  spec_max_frames=PYRAMID_SPEC_MAX_FRAMES, chunk_size=PYRAMID_CHUNK_SIZE):
+    """
+    Build the overview pyramid of a waveform.
+
+    Level k summarizes blocks of base_block * 2**k samples; each level is
+    computed from the one below by pairwise reduction, so the whole
+    pyramid costs one pass over the samples plus about as much again as
+    level 0. The spectrogram levels pool pairs of frames the same way.
+
+    Args:
+        waveform: 1-D or (channels, samples) array; the spectrogram uses
+                  the downmix
+        sample_rate: Samples per second
+        base_block: Samples per block at level 0
+        spectrogram: Also build spectrogram levels
+        spec_frame_size: FFT frame length of the spectrogram
+        spec_max_frames: Cap on the finest spectrogram level's columns
+                         (longer files average frames into columns)
+        chunk_size: Samples processed at once
+
+    Returns a dictionary with 'sample_rate', 'num_samples', 'levels'
+    (min, max and sum_squares arrays per level, per channel for 2-D
+    input) and 'spectrogram' (or None).
+    """
+    waveform = np.asarray(waveform)
+    pyramid = {
+        'sample_rate': sample_rate,
+        'num_samples': waveform.shape[-1],
+        'levels': _waveform_levels(waveform, base_block, chunk_size),
+        'spectrogram': None
+    }
+    if spectrogram:
+        pyramid['spectrogram'] = _spectrogram_levels(
+            waveform, sample_rate, spec_frame_size, spec_max_frames)
+    return pyramid
+
+
+def _pick_level(num_levels, span, unit, max_points):
+    """Finest level whose blocks of unit * 2**level cover `span` in <= max_points."""
+    if span <= unit * max_points:
+        return 0
+    return min(num_levels - 1, int(np.ceil(np.log2(span / (unit * max_points)))))
+
+
+def query_pyramid(pyramid, start_time=0.0, end_time=None, max_points=PLOT_BINS):
+    """
+    Fetch the waveform overview of a time range from the right level.
+
+    The level is chosen so at most about `max_points` blocks cover the
+    range, so the cost is independent of file length and zoom.
+
+    Returns a dictionary with:
+        times: Block start times in seconds
+        min, max, rms: Per-block values (per channel for 2-D input)
+        block_size, level: Resolution used
+    """
+    sample_rate = pyramid['sample_rate']
+    num_samples = int(pyramid['num_samples'])
+    first = int(np.clip(start_time * sample_rate, 0, num_samples))
+    last = num_samples if end_time is None else int(np.clip(end_time * sample_rate, first, num_samples))
+
+    levels = pyramid['levels']
+    base = int(levels[0]['block_size'])
+    level_index = _pick_level(len(levels), last - first, base, max_points)
+    level = levels[level_index]
+    block_size = base << level_index
+
+    first_block = first // block_size
+    last_block = max(first_block + 1, -(-last // block_size))
+    blocks = slice(first_block, last_block)
+
+    # Every block is full except possibly the final one
+    starts = np.arange(first_block, last_block) * block_size
+    counts = np.minimum(starts + block_size, num_samples) - starts
+
+    return {
+        'times': starts / sample_rate,
+        'min': level['min'][..., blocks],
+        'max': level['max'][..., blocks],
+        'rms': np.sqrt(level['sum_squares'][..., blocks] / np.maximum(counts, 1)),
+        'block_size': block_size,
+        'level': level_index
+    }
+
+
+def query_spectrogram(pyramid, start_time=0.0, end_time=None, max_frames=PLOT_BINS):
+    """
+    Fetch the spectrogram of a time range from the right pyramid level.
+
+    Returns a dictionary with 'times' (frame times in seconds),
+    'freqs', 'power_db' (bins x frames), 'hop_size' and 'level'.
+    """
+    spectrogram = pyramid['spectrogram']
+    if spectrogram is None:
+        raise ValueError("Pyramid was built without spectrogram levels")
+
+    sample_rate = pyramid['sample_rate']
+    num_samples = int(pyramid['num_samples'])
+    first = int(np.clip(start_time * sample_rate, 0, num_samples))
+    last = num_samples if end_time is None else int(np.clip(end_time * sample_rate, first, num_samples))
+
+    levels = spectrogram['levels']
+    base_hop = int(levels[0]['hop_size'])
+    level_index = _pick_level(len(levels), last - first, base_hop, max_frames)
+    level = levels[level_index]
+    hop = base_hop << level_index
+
+    first_frame = first // hop
+    last_frame = max(first_frame + 1, -(-last // hop))
+    power = level['power'][:, first_frame:last_frame]
+
+    # Each column is at the mean centre of the STFT frames pooled into it
+    frame_hop = int(spectrogram['frame_hop'])
+    per_column = hop // frame_hop
+    columns = np.arange(first_frame, first_frame + power.shape[-1])
+    first_frames = columns * per_column
+    last_frames = np.minimum(first_frames + per_column, int(spectrogram['num_frames'])) - 1
+
+    return {
+        'times': ((first_frames + last_frames) / 2 * frame_hop
+                  + spectrogram['frame_size'] / 2) / sample_rate,
+        'freqs': spectrogram['freqs'],
+        'power_db': 10 * np.log10(power + 1e-10),
+        'hop_size': hop,
+        'level': level_index
+    }
@@ -0,0 +1,353 @@
+"""
+Spectral Analysis
+
+Shared frequency-domain computations for audio analysis.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Frame length and frame cap for averaged (Welch-style) spectra
+AVERAGED_FRAME_SIZE = 8192
+AVERAGED_MAX_FRAMES = 64
+
+# Default Welch segment length and samples transformed at once
+WELCH_SEGMENT_SIZE = 1024
+WELCH_CHUNK_SIZE = 1 << 20
+
+# Default confidence level of the PSD bounds
+PSD_CONFIDENCE = 0.95
+
+# Fractional-octave smoothing widths (1/n octave, as in Audacity) and the
+# density of the smoothed output
+SMOOTHING_FRACTIONS = [3, 6, 12]
+SMOOTHING_POINTS_PER_OCTAVE = 96
+
+
+def compute_spectrum(waveform, sample_rate):
+    """
+    Compute the one-sided spectrum of a waveform with a single real FFT.
+
+    The result is meant to be computed once per waveform and passed to
+    every consumer (harmonic detection, spectrum and phase plots) instead
+    of each of them transforming the full signal again.
+
+    Returns a dictionary with:
+        freqs: Frequency axis in Hz (positive bins, DC excluded)
+        magnitude: Linear magnitude of each bin
+        magnitude_db: Magnitude in dB relative to the spectrum peak
+        phase: Phase angle of each bin in degrees
+        sample_rate: Sample rate the spectrum was computed at
+        num_samples: Length of the transformed waveform
+    """
+    num_samples = np.shape(waveform)[-1]
+
+    # Real-input FFT: half the bins and half the memory of a complex FFT
+    fft = np.fft.rfft(waveform)[..., 1:]
+    freqs = np.fft.rfftfreq(num_samples, 1/sample_rate)[1:]
+
+    magnitude = np.abs(fft)
+    phase = np.angle(fft, deg=True)
+    del fft
+
+    peak = magnitude.max(axis=-1, keepdims=True) if magnitude.size else 1.0
+    peak = np.where(peak > 0, peak, 1.0)
+    magnitude_db = 20 * np.log10(magnitude / peak + 1e-10)
+
+    return {
+        'freqs': freqs,
+        'magnitude': magnitude,
+        'magnitude_db': magnitude_db,
+        'phase': phase,
+        'sample_rate': sample_rate,
+        'num_samples': num_samples
+    }
+
+
+def smooth_spectrum(freqs, magnitude, fraction=6, points_per_octave=SMOOTHING_POINTS_PER_OCTAVE):
+    """
+    Fractional-octave smoothing of a uniformly spaced magnitude spectrum.
+
+    Each output point is the RMS of the bins within 1/fraction octave
+    centred on it, taken from a cumulative sum of the power, so the cost
+    is one O(N) pass however wide the bands get. Points are log-spaced at
+    `points_per_octave`, which also bounds the size of the result; bands
+    narrower than a bin take the nearest bin.
+
+    Args:
+        freqs: Ascending, uniformly spaced bin frequencies in Hz (no DC)
+        magnitude: Linear magnitude per bin (per channel for 2-D input)
+        fraction: Band width as 1/fraction octave (e.g. 3, 6, 12)
+        points_per_octave: Output points per octave
+
+    Returns a dictionary with:
+        freqs: Output frequencies in Hz
+        magnitude: Smoothed linear magnitude
+        magnitude_db: Smoothed magnitude in dB relative to its peak
+    """
+    freqs = np.asarray(freqs, dtype=np.float64)
+    power = np.square(magnitude, dtype=np.float64)
+    cumulative = np.concatenate(
+        [np.zeros(power.shape[:-1] + (1,)), np.cumsum(power, axis=-1)], axis=-1)
+
+    octaves = np.log2(freqs[-1] / freqs[0]) if len(freqs) > 1 else 0
+    centres = np.geomspace(freqs[0], freqs[-1], max(1, int(octaves * points_per_octave) + 1))
+    half_width = 2 ** (0.5 / fraction)
+    lower = np.searchsorted(freqs, centres / half_width)
+    upper = np.searchsorted(freqs, centres * half_width, side='right')
+
+    nearest = np.clip(np.searchsorted(freqs, centres), 1, max(1, len(freqs) - 1))
+    nearest -= centres - freqs[nearest - 1] < freqs[np.minimum(nearest, len(freqs) - 1)] - centres
+    empty = upper <= lower
+    lower = np.where(empty, nearest, lower)
+    upper = np.where(empty, nearest + 1, upper)
+
+    smoothed = np.sqrt((cumulative[..., upper] - cumulative[..., lower]) / (upper - lower))
+    peak = smoothed.max(axis=-1, keepdims=True) if smoothed.size else 1.0
+    peak = np.where(peak > 0, peak, 1.0)
+
+    return {
+        'freqs': centres,
+        'magnitude': smoothed,
+        'magnitude_db': 20 * np.log10(smoothed / peak + 1e-10)
+    }
+
+
+class WelchAccumulator:
+    """
+    Welch power spectral density accumulated over a stream of blocks.
+
+    Segment periodograms are summed as blocks arrive; the samples after
+    the last complete segment are carried to the next update(), so a
+    signal fed in blocks of any size gives the same estimate as
+    scipy.signal.welch (Hann window, 'constant' detrending, density
+    scaling) on the whole signal. Call end_stream() between unrelated
+    signals (e.g. files) so no segment straddles them. Partial
+    accumulators from parallel workers combine with merge().
+
+    Blocks are 1-D or (channels, samples); all blocks fed to one
+    accumulator must have the same number of channels.
+
+    Usage:
+        psd = WelchAccumulator(rate)
+        for block in reader.blocks():
+            psd.update(block)
+        result = psd.result()
+    """
+
+    def __init__(self, sample_rate, nperseg=WELCH_SEGMENT_SIZE, noverlap=None, window='hann',
+                 chunk_size=WELCH_CHUNK_SIZE):
+        from scipy.signal import get_window
+
+        self.sample_rate = sample_rate
+        self.nperseg = int(nperseg)
+        self.noverlap = self.nperseg // 2 if noverlap is None else int(noverlap)
+        if not 0 <= self.noverlap < self.nperseg:
+            raise ValueError("noverlap must be in [0, nperseg)")
+        self.hop = self.nperseg - self.noverlap
+        self.window = window
+        self.chunk_size = chunk_size
+        self.num_segments = 0
+        self._taps = get_window(window, self.nperseg)
+        self._sum = None
+        self._pending = None
+
+    def _init_state(self, shape):
+        self._sum = np.zeros(shape + (self.nperseg // 2 + 1,))
+        self._pending = np.empty(shape + (0,))
+
+    def update(self, waveform):
+        """Add a block of samples; returns self for chaining."""
+        waveform = np.asarray(waveform)
+        if self._sum is None:
+            self._init_state(waveform.shape[:-1])
+        elif waveform.shape[:-1] != self._sum.shape[:-1]:
+            raise ValueError("Block channel layout does not match earlier blocks")
+
+        for start in range(0, waveform.shape[-1], self.chunk_size):
+            chunk = np.asarray(waveform[..., start:start + self.chunk_size], dtype=np.float64)
+            samples = np.concatenate([self._pending, chunk], axis=-1)
+            length = samples.shape[-1]
+            count = 1 + (length - self.nperseg) // self.hop if length >= self.nperseg else 0
+            if count:
+                segments = sliding_window_view(samples, self.nperseg, axis=-1)[..., ::self.hop, :]
+                segments = segments - segments.mean(axis=-1, keepdims=True)
+                spectrum = np.fft.rfft(segments * self._taps, axis=-1)
+                self._sum += (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=-2)
+                self.num_segments += count
+            # Keep from the start of the next (incomplete) segment
+            self._pending = samples[..., count * self.hop:]
+        return self
+
+    def end_stream(self):
+        """Drop the carried samples so the next update() starts a new signal."""
+        if self._pending is not None:
+            self._pending = self._pending[..., :0]
+        return self
+
+    def merge(self, other):
+        """
+        Combine the segments of another accumulator into this one.
+
+        Segments that would have straddled the boundary between the two
+        streams are not counted.
+        """
+        if (other.sample_rate, other.nperseg, other.noverlap, other.window) != \
+                (self.sample_rate, self.nperseg, self.noverlap, self.window):
+            raise ValueError("Cannot merge accumulators with different Welch parameters")
+        if other._sum is None:
+            return self
+        if self._sum is None:
+            self._init_state(other._sum.shape[:-1])
+        elif other._sum.shape != self._sum.shape:
+            raise ValueError("Cannot merge accumulators with different channel layouts")
+
+        self._sum += other._sum
+        self.num_segments += other.num_segments
+        return self
+
+    def degrees_of_freedom(self):
+        """
+        Equivalent degrees of freedom of the averaged estimate.
+
+        2 per segment, reduced for the correlation between overlapping
+        windowed segments (Percival & Walden); 2 * num_segments without
+        overlap.
+        """
+        count = self.num_segments
+        if count == 0:
+            return 0.0
+        energy = np.sum(self._taps ** 2)
+        correlation = 0.0
+        for lag in range(1, min(count, -(-self.nperseg // self.hop))):
+            shift = lag * self.hop
+            overlap = np.dot(self._taps[:-shift], self._taps[shift:]) / energy
+            correlation += (1 - lag / count) * overlap ** 2
+        return 2 * count / (1 + 2 * correlation)
+
+    def result(self, confidence=PSD_CONFIDENCE):
+        """
+        Return the averaged PSD with chi-squared confidence bounds.
+
+        Returns a dictionary with:
+            freqs: Frequency axis in Hz
+            psd: Power spectral density (per channel for 2-D input)
+            psd_db: PSD in dB
+            psd_lower, psd_upper: `confidence` interval of the PSD
+            num_segments: Segments averaged
+            dof: Equivalent degrees of freedom
+        """
+        from scipy.stats import chi2
+
+        if self.num_segments == 0:
+            raise ValueError("No complete segments accumulated")
+
+        scale = np.full(self.nperseg // 2 + 1, 2 / (self.sample_rate * np.sum(self._taps ** 2)))
+        scale[0] /= 2
+        if self.nperseg % 2 == 0:
+            scale[-1] /= 2  # DC and Nyquist have no mirrored half
+        psd = self._sum / self.num_segments * scale
+
+        dof = self.degrees_of_freedom()
+        alpha = 1 - confidence
+
+        return {
+            'freqs': np.fft.rfftfreq(self.nperseg, 1/self.sample_rate),
+            'psd': psd,
+            'psd_db': 10 * np.log10(psd + 1e-10),
+            'psd_lower': psd * dof / chi2.ppf(1 - alpha / 2, dof),
+            'psd_upper': psd * dof / chi2.ppf(alpha / 2, dof),
+            'num_segments': self.num_segments,
+            'dof': dof
+        }
+
+
+def compute_psd(waveform, sample_rate, nperseg=WELCH_SEGMENT_SIZE):
+    """
+    Estimate the power spectral density with Welch's method.
+
+    The segment length is capped at a quarter of the signal so short
+    clips still average several segments. The waveform is processed in
+    chunks through a WelchAccumulator, so memory-mapped input is never
+    converted whole.
+
+    Returns the WelchAccumulator.result() dictionary (freqs, psd, psd_db,
+    confidence bounds and segment count).
+    """
+    nperseg = max(1, min(nperseg, np.shape(waveform)[-1] // 4))
+    return WelchAccumulator(sample_rate, nperseg).update(waveform).result()
+
+
+def compute_averaged_spectrum(waveform, sample_rate, frame_size=AVERAGED_FRAME_SIZE,
+                              max_frames=AVERAGED_MAX_FRAMES):
+    """
+    Estimate a power spectrum by averaging Hann-windowed frames (Welch-style).
+
+    At most `max_frames` frames are taken, spread evenly across the whole
+    waveform (50% overlap when the waveform is short enough), so the cost
+    is bounded by frame_size * max_frames however long the input is. Only
+    the sampled frames are read, which keeps memory-mapped files cheap.
+
+    Returns a dictionary with:
+        freqs: Frequency axis in Hz (DC included)
+        power: Average power per bin (per channel for 2-D input)
+        power_db: Power in dB relative to the per-channel peak
+        frame_size: Samples per frame
+        num_frames: Number of frames averaged
+    """
+    waveform = np.asarray(waveform)
+    num_samples = waveform.shape[-1]
+    frame_size = max(1, min(frame_size, num_samples))
+    hop = max(1, frame_size // 2)
+
+    num_frames = min(max_frames, 1 + (num_samples - frame_size) // hop) if num_samples else 0
+    starts = np.linspace(0, num_samples - frame_size, max(num_frames, 1)).astype(np.intp)
+    window = np.hanning(frame_size) if frame_size > 1 else np.ones(1)
+
+    power = np.zeros(waveform.shape[:-1] + (frame_size // 2 + 1,))
+    if num_frames:
+        for start in starts:
+            frame = waveform[..., start:start + frame_size] * window
+            power += np.abs(np.fft.rfft(frame)) ** 2
+        power /= num_frames * np.sum(window ** 2)
+
+    peak = power.max(axis=-1, keepdims=True) if power.size else 1.0
+    peak = np.where(peak > 0, peak, 1.0)
+    power_db = 10 * np.log10(power / peak + 1e-20)
+
+    return {
+        'freqs': np.fft.rfftfreq(frame_size, 1/sample_rate),
+        'power': power,
+        'power_db': power_db,
+        'frame_size': frame_size,
+        'num_frames': num_frames
+    }
+
+
+def interpolate_peaks(spectrum_db, peaks):
+    """
+    Refine peak positions with parabolic interpolation on a dB spectrum.
+
+    Fits a parabola through each peak bin and its two neighbours, giving
+    sub-bin frequency accuracy (the log-magnitude of a Hann-windowed
+    tone is close to a parabola near its maximum).
+
+    Args:
+        spectrum_db: 1-D spectrum in dB
+        peaks: Indices of local maxima
+
+    Returns:
+        (positions, heights): fractional bin positions and interpolated
+        peak heights in dB
+    """
+    peaks = np.asarray(peaks, dtype=np.intp)
+    inner = (peaks > 0) & (peaks < len(spectrum_db) - 1)
+    left = spectrum_db[np.where(inner, peaks - 1, peaks)]
+    centre = spectrum_db[peaks]
+    right = spectrum_db[np.where(inner, peaks + 1, peaks)]
+
+    curvature = left - 2 * centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(inner & (curvature < 0), 0.5 * (left - right) / curvature, 0.0)
+    return peaks + offset, centre - 0.25 * (left - right) * offset
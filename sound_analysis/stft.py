@@ -0,0 +1,291 @@
+"""
+Short-Time Fourier Transform
+
+One configurable STFT engine for every spectrogram view: window size,
+hop, window type and zero padding come from the caller, the output
+matrix size is capped, and results can be cached so display-only
+changes never recompute the transform. StreamingSTFT and stft_file()
+compute the same frames block by block for recordings too large to load.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .cache import make_cache_key
+from .decimation import pool_segments
+from .wav_io import DEFAULT_BLOCK_SIZE, WaveReader
+
+
+# Window types offered in the UI (any scipy.signal.get_window name works)
+STFT_WINDOWS = ['hann', 'hamming', 'blackman', 'rectangular']
+
+# Defaults: frame length, overlap and zero-padding factor
+STFT_WINDOW_SIZE = 1024
+STFT_PAD_FACTOR = 1
+
+# Output caps: columns, and total cells (bins x columns); frames beyond
+# them are pooled into columns
+STFT_MAX_FRAMES = 4096
+STFT_MAX_CELLS = 1 << 22
+
+# Approximate samples transformed at once
+STFT_CHUNK_SIZE = 1 << 20
+
+
+def stft_params(window_size=STFT_WINDOW_SIZE, hop_size=None, window='hann',
+                pad_factor=STFT_PAD_FACTOR):
+    """Return a normalized STFT parameter dictionary (hop defaults to 50% overlap)."""
+    return {
+        'window_size': int(window_size),
+        'hop_size': int(hop_size or window_size // 2),
+        'window': window,
+        'pad_factor': max(1, int(pad_factor))
+    }
+
+
+def _stft_window(window, window_size, n_fft, sample_rate):
+    """Window taps and the one-sided PSD scale of each bin."""
+    from scipy.signal import get_window
+
+    taps = get_window('boxcar' if window == 'rectangular' else window, window_size)
+    scale = np.full(n_fft // 2 + 1, 2 / (sample_rate * np.sum(taps ** 2)))
+    scale[0] /= 2
+    if n_fft % 2 == 0:
+        scale[-1] /= 2  # DC and Nyquist have no mirrored half
+    return taps, scale
+
+
+def _frame_power(segment, hop, taps, n_fft, scale):
+    """(bins, frames) float32 power of every full frame in `segment`, `hop` apart."""
+    frames = sliding_window_view(np.asarray(segment, dtype=np.float64), len(taps))[::hop] * taps
+    spectrum = np.fft.rfft(frames, n=n_fft, axis=-1)
+    return ((spectrum.real ** 2 + spectrum.imag ** 2) * scale).T.astype(np.float32)
+
+
+def compute_stft(waveform, sample_rate, window_size=STFT_WINDOW_SIZE, hop_size=None,
+                 window='hann', pad_factor=STFT_PAD_FACTOR, max_frames=STFT_MAX_FRAMES,
+                 max_cells=STFT_MAX_CELLS, chunk_size=STFT_CHUNK_SIZE, pool='max'):
+    """
+    Compute a one-sided power spectrogram (PSD scaling, like scipy's spectrogram).
+
+    Args:
+        waveform: 1-D array, or (channels, samples) which is downmixed
+        sample_rate: Samples per second
+        window_size: Samples per frame
+        hop_size: Samples between frames (default: window_size // 2; at
+                  most window_size, so every sample is transformed)
+        window: Window type ('rectangular' or any scipy.signal.get_window name)
+        pad_factor: Zero-pad each frame to pad_factor * window_size samples
+                    (a finer frequency grid)
+        max_frames: Most columns returned
+        max_cells: Most bins x columns returned (None for no limit)
+        chunk_size: Approximate samples transformed at once
+        pool: 'max' or 'mean', how frames are combined into a column
+
+    Every frame is computed (in chunks); when there are more than the
+    caps allow, groups of consecutive frames are pooled into one column,
+    so short events are never skipped. 'max' keeps them visible, 'mean'
+    preserves average power.
+
+    Returns a dictionary with:
+        freqs: Frequency of each bin in Hz
+        times: Column centre times in seconds (mean of the pooled frames)
+        power: float32 (bins, columns) power spectral density
+        window_size, window, n_fft: Parameters used
+        hop_size: Samples between columns (frame hop * frames_per_column)
+        frames_per_column: Frames pooled into each column (1 = unpooled)
+    """
+    waveform = np.asarray(waveform)
+    if waveform.ndim > 1:
+        waveform = waveform.mean(axis=0, dtype=np.float64)
+    num_samples = len(waveform)
+
+    window_size = max(2, min(int(window_size), num_samples))
+    n_fft = window_size * max(1, int(pad_factor))
+    num_bins = n_fft // 2 + 1
+    hop = min(max(1, int(hop_size or window_size // 2)), window_size)
+
+    column_cap = max_frames if max_cells is None else min(max_frames, max(1, max_cells // num_bins))
+    num_frames = 1 + (num_samples - window_size) // hop if num_samples >= window_size else 0
+    group = max(1, -(-num_frames // column_cap))
+    num_columns = -(-num_frames // group)
+
+    taps, scale = _stft_window(window, window_size, n_fft, sample_rate)
+
+    power = np.empty((num_bins, num_columns), dtype=np.float32)
+    # Whole groups per chunk, so no column straddles two chunks
+    frames_per_chunk = max(1, chunk_size // window_size // group) * group
+    for first in range(0, num_frames, frames_per_chunk):
+        last = min(first + frames_per_chunk, num_frames)
+        segment = waveform[first * hop:(last - 1) * hop + window_size]
+        frames = _frame_power(segment, hop, taps, n_fft, scale)
+        if group > 1:
+            frames = pool_segments(frames, np.arange(0, last - first, group), 1, pool)
+        power[:, first // group:first // group + frames.shape[1]] = frames
+
+    centres = np.arange(num_frames) * hop + window_size / 2
+    if group > 1:
+        centres = pool_segments(centres, np.arange(0, num_frames, group), 0, 'mean')
+
+    return {
+        'freqs': np.fft.rfftfreq(n_fft, 1/sample_rate),
+        'times': centres / sample_rate,
+        'power': power,
+        'window_size': window_size,
+        'hop_size': hop * group,
+        'frames_per_column': group,
+        'window': window,
+        'n_fft': n_fft
+    }
+
+
+def cached_stft(cache, content_key, waveform, sample_rate, params=None):
+    """
+    compute_stft() through a cache, keyed by content and STFT parameters.
+
+    Args:
+        cache: Cache with get()/put() (e.g. cache.AnalysisCache)
+        content_key: Identifies the waveform (e.g. its analysis cache key)
+        waveform, sample_rate: Passed to compute_stft() on a miss
+        params: stft_params() dictionary (defaults if None)
+
+    Only the transform parameters are part of the key, so changing how
+    the result is displayed (colour scale, frequency range) is a hit.
+    """
+    params = params or stft_params()
+    key = make_cache_key(content_key, 'stft', sorted(params.items()))
+    result = cache.get(key)
+    if result is None:
+        result = compute_stft(waveform, sample_rate, **params)
+        cache.put(key, result)
+    return result
+
+
+class StreamingSTFT:
+    """
+    STFT computed block by block, carrying the overlap between blocks.
+
+    Each call to process() returns the frames completed by that block;
+    the last window_size - hop samples (the start of the next frame) are
+    kept for the next call. Feeding a signal in blocks of any size gives
+    the same frames as compute_stft() with the same parameters (and no
+    caps). Blocks are 1-D or (channels, samples), which is downmixed.
+
+    Usage:
+        stft = StreamingSTFT(rate, window_size=2048)
+        for block in reader.blocks():
+            output.append(stft.process(block))
+    """
+
+    def __init__(self, sample_rate, window_size=STFT_WINDOW_SIZE, hop_size=None,
+                 window='hann', pad_factor=STFT_PAD_FACTOR):
+        params = stft_params(window_size, hop_size, window, pad_factor)
+        self.sample_rate = sample_rate
+        self.window_size = max(2, params['window_size'])
+        self.hop_size = max(1, params['hop_size'])
+        self.window = window
+        self.n_fft = self.window_size * params['pad_factor']
+        self.freqs = np.fft.rfftfreq(self.n_fft, 1/sample_rate)
+        self.num_frames = 0
+        self._taps, self._scale = _stft_window(window, self.window_size, self.n_fft, sample_rate)
+        self._pending = np.empty(0)
+        self._skip = 0  # Samples before the next frame not yet received (hop > window)
+
+    def process(self, block):
+        """Add the next block; returns (bins, new frames) float32 power."""
+        block = np.asarray(block)
+        if block.ndim > 1:
+            block = block.mean(axis=0, dtype=np.float64)
+        skipped = min(self._skip, len(block))
+        self._skip -= skipped
+        pending = np.concatenate([self._pending, block[skipped:]])
+
+        if len(pending) < self.window_size:
+            self._pending = pending
+            return np.empty((len(self.freqs), 0), dtype=np.float32)
+
+        power = _frame_power(pending, self.hop_size, self._taps, self.n_fft, self._scale)
+        new_frames = power.shape[1]
+        self.num_frames += new_frames
+        # Keep from the first sample of the next (incomplete) frame
+        self._pending = pending[new_frames * self.hop_size:]
+        self._skip = max(0, new_frames * self.hop_size - len(pending))
+        return power
+
+    def times(self, first=0, count=None):
+        """Centre times in seconds of frames [first, first + count) (default: all so far)."""
+        count = self.num_frames - first if count is None else count
+        return ((np.arange(first, first + count) * self.hop_size + self.window_size / 2)
+                / self.sample_rate)
+
+
+def iter_stft(blocks, sample_rate, **params):
+    """
+    Yield (bins, frames) power chunks of a stream of blocks.
+
+    Keyword arguments are StreamingSTFT's STFT parameters; blocks with no
+    completed frame yield nothing.
+    """
+    stft = StreamingSTFT(sample_rate, **params)
+    for block in blocks:
+        power = stft.process(block)
+        if power.shape[1]:
+            yield power
+
+
+def stft_file(file_path, output_path=None, mix='downmix', block_size=DEFAULT_BLOCK_SIZE,
+              window_size=STFT_WINDOW_SIZE, hop_size=None, window='hann',
+              pad_factor=STFT_PAD_FACTOR):
+    """
+    Compute the STFT of a WAV file in fixed memory.
+
+    The file is read block by block through a StreamingSTFT and frames
+    are written into the output as they complete. With `output_path` the
+    output is a .npy file of (frames, bins) float32 power on disk, so the
+    size of the recording does not matter; without it the output is an
+    in-memory array.
+
+    Args:
+        file_path: WAV file to read
+        output_path: .npy file to write the frames to (None keeps them in memory)
+        mix: Channel mix (see wav_io.mix_channels); 'all' is downmixed
+        block_size: Frames read per block
+        window_size, hop_size, window, pad_factor: As in compute_stft()
+
+    Returns the same dictionary as compute_stft(); 'power' is a (bins,
+    frames) view, memory-mapped read-only when `output_path` is given.
+    Unlike compute_stft() frames are never pooled to cap the output.
+    """
+    with WaveReader(file_path, mix=mix) as reader:
+        sample_rate = reader.info['sample_rate']
+        total_samples = reader.info['total_samples']
+        stft = StreamingSTFT(sample_rate, window_size, hop_size, window, pad_factor)
+
+        num_frames = (1 + (total_samples - stft.window_size) // stft.hop_size
+                      if total_samples >= stft.window_size else 0)
+        shape = (num_frames, len(stft.freqs))
+        if output_path is None:
+            frames = np.empty(shape, dtype=np.float32)
+        else:
+            frames = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32,
+                                               shape=shape)
+
+        for block in reader.blocks(block_size):
+            first = stft.num_frames
+            power = stft.process(block)
+            frames[first:stft.num_frames] = power.T
+
+    if output_path is not None:
+        frames.flush()
+        del frames
+        frames = np.load(output_path, mmap_mode='r')
+
+    return {
+        'freqs': stft.freqs,
+        'times': stft.times(),
+        'power': frames.T,
+        'window_size': stft.window_size,
+        'hop_size': stft.hop_size,
+        'frames_per_column': 1,
+        'window': window,
+        'n_fft': stft.n_fft
+    }
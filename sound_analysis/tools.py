@@ -7,39 +7,29 @@ File management and user interface utilities.
 
 import os
 import numpy as np
+from .levels import compute_level_metrics, levels_to_db
 
 
 def wave_to_db(waveform):
-    """Convert waveform to decibels."""
-    sq_amplitude = waveform ** 2
-    mean_squared_amplitude = np.mean(sq_amplitude)
+    """Convert waveform to decibels (per channel for 2-D input)."""
+    mean_squared_amplitude = compute_level_metrics(waveform)['mean_square']
     decibels = 10 * np.log10(mean_squared_amplitude / 1e-6)
     return decibels
 
 
 def wave_to_db_rms(waveform):
-    """Convert waveform to decibels using RMS."""
-    sq_amplitude = np.mean(waveform ** 2)
-    rms_value = np.sqrt(sq_amplitude)
+    """Convert waveform to decibels using RMS (per channel for 2-D input)."""
+    rms_value = compute_level_metrics(waveform)['rms']
     decibels = 20 * np.log10(rms_value / 1e-6)
     return decibels
 
 
 def detect_db_range(waveform):
     """Detect the dynamic range of the audio in decibels."""
-    max_amplitude = np.max(np.abs(waveform))
-    min_amplitude = np.min(np.abs(waveform[waveform != 0]))  # Avoid log(0)
-    
-    max_db = 20 * np.log10(max_amplitude / 1e-6) if max_amplitude > 0 else -np.inf
-    min_db = 20 * np.log10(min_amplitude / 1e-6) if min_amplitude > 0 else -np.inf
-    
-    dynamic_range = max_db - min_db if min_db != -np.inf else 0
-    
-    return {
-        'max_db': max_db,
-        'min_db': min_db,
-        'dynamic_range': dynamic_range
-    }
+    levels = levels_to_db(compute_level_metrics(waveform))
+    if isinstance(levels, list):
+        return [channel['db_range'] for channel in levels]
+    return levels['db_range']
 
 
 def normalize_waveform(waveform):
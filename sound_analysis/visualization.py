@@ -6,14 +6,17 @@ Plotting and visualization functions for audio analysis.
 
 import numpy as np
 import matplotlib.pyplot as plt
+from .decimation import minmax_decimate
+from .spectral import compute_spectrum
+from .stft import compute_stft
 
 
 def plot_waveform(waveform, sample_rate, duration, title="Audio Waveform", save_path=None):
-    """Plot the audio waveform."""
-    time = np.linspace(0, duration, num=len(waveform))
+    """Plot the audio waveform (min/max decimated to the plot width)."""
+    time, values = minmax_decimate(waveform, sample_rate)
     
     plt.figure(figsize=(12, 6))
-    plt.plot(time, waveform, color='blue', linewidth=0.5)
+    plt.plot(time, values, color='blue', linewidth=0.5)
     plt.title(title, fontsize=16, fontweight='bold')
     plt.xlabel('Time (seconds)', fontsize=12)
     plt.ylabel('Amplitude', fontsize=12)
@@ -27,14 +30,23 @@ def plot_waveform(waveform, sample_rate, duration, title="Audio Waveform", save_
     plt.show()
 
 
-def plot_spectrogram(waveform, sample_rate, title="Frequency Spectrogram", save_path=None):
-    """Plot the frequency spectrogram."""
+def _draw_spectrogram(ax, waveform, sample_rate, stft=None):
+    """Draw a compute_stft() spectrogram (computed with defaults if not given) on `ax`."""
+    if stft is None:
+        stft = compute_stft(waveform, sample_rate)
+    return ax.pcolormesh(stft['times'], stft['freqs'], 10 * np.log10(stft['power'] + 1e-10),
+                         vmin=-20, vmax=50, cmap='viridis', shading='auto')
+
+
+def plot_spectrogram(waveform, sample_rate, title="Frequency Spectrogram", save_path=None,
+                     stft=None):
+    """Plot the frequency spectrogram (pass `stft` to choose the window settings)."""
     plt.figure(figsize=(12, 6))
-    plt.specgram(waveform, Fs=sample_rate, vmin=-20, vmax=50, cmap='viridis')
+    mesh = _draw_spectrogram(plt.gca(), waveform, sample_rate, stft)
     plt.title(title, fontsize=16, fontweight='bold')
     plt.xlabel('Time (seconds)', fontsize=12)
     plt.ylabel('Frequency (Hz)', fontsize=12)
-    plt.colorbar(label="Intensity (dB)")
+    plt.colorbar(mesh, label="Intensity (dB)")
     plt.tight_layout()
     
     if save_path:
@@ -44,19 +56,13 @@ def plot_spectrogram(waveform, sample_rate, title="Frequency Spectrogram", save_
     plt.show()
 
 
-def plot_frequency_analysis(waveform, sample_rate, title="Frequency Analysis"):
+def plot_frequency_analysis(waveform, sample_rate, title="Frequency Analysis", spectrum=None):
     """Plot frequency domain analysis."""
-    # Compute FFT
-    fft = np.fft.fft(waveform)
-    freqs = np.fft.fftfreq(len(fft), 1/sample_rate)
-    magnitude = np.abs(fft)
-    
-    # Only plot positive frequencies
-    positive_freqs = freqs[:len(freqs)//2]
-    positive_magnitude = magnitude[:len(magnitude)//2]
+    if spectrum is None:
+        spectrum = compute_spectrum(waveform, sample_rate)
     
     plt.figure(figsize=(12, 6))
-    plt.plot(positive_freqs, 20 * np.log10(positive_magnitude + 1e-10))
+    plt.plot(spectrum['freqs'], 20 * np.log10(spectrum['magnitude'] + 1e-10))
     plt.title(title, fontsize=16, fontweight='bold')
     plt.xlabel('Frequency (Hz)', fontsize=12)
     plt.ylabel('Magnitude (dB)', fontsize=12)
@@ -65,34 +71,31 @@ def plot_frequency_analysis(waveform, sample_rate, title="Frequency Analysis"):
     plt.show()
 
 
-def plot_combined_analysis(waveform, sample_rate, duration, filename):
+def plot_combined_analysis(waveform, sample_rate, duration, filename, spectrum=None):
     """Create a combined visualization with multiple plots."""
+    if spectrum is None:
+        spectrum = compute_spectrum(waveform, sample_rate)
+    
     fig, axes = plt.subplots(2, 2, figsize=(15, 10))
     fig.suptitle(f"Complete Analysis: {filename}", fontsize=16, fontweight='bold')
     
-    # Time domain plot
-    time = np.linspace(0, duration, num=len(waveform))
-    axes[0, 0].plot(time, waveform, color='blue', linewidth=0.5)
+    # Time domain plot (min/max decimated to the plot width)
+    time, values = minmax_decimate(waveform, sample_rate)
+    axes[0, 0].plot(time, values, color='blue', linewidth=0.5)
     axes[0, 0].set_title('Waveform')
     axes[0, 0].set_xlabel('Time (seconds)')
     axes[0, 0].set_ylabel('Amplitude')
     axes[0, 0].grid(True, alpha=0.3)
     
     # Frequency domain plot
-    fft = np.fft.fft(waveform)
-    freqs = np.fft.fftfreq(len(fft), 1/sample_rate)
-    magnitude = np.abs(fft)
-    positive_freqs = freqs[:len(freqs)//2]
-    positive_magnitude = magnitude[:len(magnitude)//2]
-    
-    axes[0, 1].plot(positive_freqs, 20 * np.log10(positive_magnitude + 1e-10))
+    axes[0, 1].plot(spectrum['freqs'], 20 * np.log10(spectrum['magnitude'] + 1e-10))
     axes[0, 1].set_title('Frequency Spectrum')
     axes[0, 1].set_xlabel('Frequency (Hz)')
     axes[0, 1].set_ylabel('Magnitude (dB)')
     axes[0, 1].grid(True, alpha=0.3)
     
     # Spectrogram
-    axes[1, 0].specgram(waveform, Fs=sample_rate, vmin=-20, vmax=50, cmap='viridis')
+    _draw_spectrogram(axes[1, 0], waveform, sample_rate)
     axes[1, 0].set_title('Spectrogram')
     axes[1, 0].set_xlabel('Time (seconds)')
     axes[1, 0].set_ylabel('Frequency (Hz)')
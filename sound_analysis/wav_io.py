@@ -0,0 +1,403 @@
+"""
+WAV Input/Output
+
+Streaming and memory-mapped access to WAV files so long recordings can
+be processed without reading the whole file into memory.
+Decodes 8-bit unsigned, 16/24/32-bit integer and 32/64-bit float PCM,
+including WAVE_FORMAT_EXTENSIBLE files.
+"""
+
+import os
+import struct
+import numpy as np
+
+
+# Default number of frames per streamed block (~1.5s at 44.1 kHz)
+DEFAULT_BLOCK_SIZE = 65536
+
+# WAV format tags
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Full-scale value of the 16-bit range the analysis functions work in
+INT16_FULL_SCALE = 32768.0
+
+# Ways to reduce (channels, samples) data for analysis, see mix_channels()
+CHANNEL_MODES = ['left', 'right', 'downmix', 'mid', 'side', 'all']
+
+
+def _make_info(sample_rate, total_samples, channels, sample_width):
+    """Build the file info dictionary shared by all readers."""
+    return {
+        'sample_rate': sample_rate,
+        'total_samples': total_samples,
+        'channels': channels,
+        'sample_width': sample_width,
+        'duration': total_samples / sample_rate,
+        'channel_type': {1: "Mono", 2: "Stereo"}.get(channels, f"{channels}-channel")
+    }
+
+
+def _parse_chunks(read_at, file_size):
+    """
+    Walk the RIFF chunk list once to find the 'fmt ' and 'data' chunks.
+
+    `read_at(offset, size)` returns `size` bytes starting at `offset`, so
+    the same parser serves open files and in-memory buffers.
+    """
+    header = read_at(0, 12)
+    if len(header) < 12 or header[0:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise ValueError("Not a RIFF/WAVE file")
+
+    fmt = None
+    position = 12
+    while position + 8 <= file_size:
+        chunk_id, chunk_size = struct.unpack('<4sI', read_at(position, 8))
+        body = position + 8
+
+        if chunk_id == b'fmt ':
+            fmt_chunk = read_at(body, min(chunk_size, 40))
+            format_tag, channels, sample_rate, _, block_align, bits = \
+                struct.unpack_from('<HHIIHH', fmt_chunk)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt_chunk) >= 40:
+                # The real format is the first two bytes of the SubFormat GUID
+                format_tag = struct.unpack_from('<H', fmt_chunk, 24)[0]
+            fmt = (format_tag, channels, sample_rate, block_align)
+
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("WAV 'data' chunk found before 'fmt ' chunk")
+            format_tag, channels, sample_rate, block_align = fmt
+            if channels == 0 or block_align % channels:
+                raise ValueError("Invalid WAV channel layout")
+
+            # Streaming writers may leave the size unset; clamp to the file
+            data_size = min(chunk_size, file_size - body)
+            data_size -= data_size % block_align
+            sample_width = block_align // channels
+            _native_dtype(sample_width, format_tag)  # Validate the format
+
+            info = _make_info(sample_rate, data_size // block_align,
+                              channels, sample_width)
+            info.update({
+                'format_tag': format_tag,
+                'block_align': block_align,
+                'data_offset': body,
+                'data_size': data_size
+            })
+            return info
+
+        # Chunks are word aligned
+        position = body + chunk_size + (chunk_size & 1)
+
+    raise ValueError("WAV file has no 'data' chunk")
+
+
+def _native_dtype(sample_width, format_tag):
+    """
+    Return the NumPy dtype stored in the file, or None for packed 24-bit.
+
+    Raises ValueError for formats that cannot be decoded.
+    """
+    if format_tag == WAVE_FORMAT_PCM:
+        if sample_width == 1:
+            return np.dtype(np.uint8)
+        if sample_width == 2:
+            return np.dtype('<i2')
+        if sample_width == 3:
+            return None
+        if sample_width == 4:
+            return np.dtype('<i4')
+    elif format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        if sample_width == 4:
+            return np.dtype('<f4')
+        if sample_width == 8:
+            return np.dtype('<f8')
+
+    raise ValueError(
+        f"Unsupported WAV format (tag {format_tag:#06x}, {sample_width * 8}-bit)")
+
+
+def _decode_int24(raw_data):
+    """Unpack little-endian packed 24-bit samples into int32."""
+    packed = np.frombuffer(raw_data, dtype=np.uint8).reshape(-1, 3)
+    samples = packed[:, 2].astype(np.int8).astype(np.int32) << 16
+    samples |= packed[:, 1].astype(np.int32) << 8
+    samples |= packed[:, 0]
+    return samples
+
+
+def scale_samples(samples, sample_width, format_tag=WAVE_FORMAT_PCM, normalize=True):
+    """
+    Convert samples in their stored dtype to the analysis scale.
+
+    Args:
+        samples: Array in the file's native dtype (int32 for 24-bit)
+        sample_width: Bytes per sample
+        format_tag: WAVE_FORMAT_PCM or WAVE_FORMAT_IEEE_FLOAT
+        normalize: True for float32 in [-1, 1]; False for the 16-bit
+                   integer range used by the level and plotting functions
+
+    16-bit PCM with normalize=False is returned unchanged (no copy).
+    """
+    if format_tag == WAVE_FORMAT_PCM and sample_width == 2 and not normalize:
+        return samples
+
+    decoded = samples.astype(np.float32)
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        full_scale = 1.0
+    elif sample_width == 1:
+        decoded -= 128  # 8-bit WAV is unsigned with a 128 midpoint
+        full_scale = 128.0
+    else:
+        full_scale = float(2 ** (8 * sample_width - 1))
+
+    target_scale = 1.0 if normalize else INT16_FULL_SCALE
+    if full_scale != target_scale:
+        decoded *= np.float32(target_scale / full_scale)
+    return decoded
+
+
+def decode_frames(raw_data, channels, sample_width, format_tag=WAVE_FORMAT_PCM,
+                  normalize=True):
+    """
+    Decode raw interleaved WAV bytes into a (samples, channels) array.
+
+    Fully vectorized: no per-sample Python loop for any supported format.
+    See scale_samples() for the meaning of `normalize`.
+    """
+    dtype = _native_dtype(sample_width, format_tag)
+    if dtype is None:
+        samples = _decode_int24(raw_data)
+    else:
+        samples = np.frombuffer(raw_data, dtype=dtype)
+
+    decoded = scale_samples(samples, sample_width, format_tag, normalize)
+    return decoded.reshape(-1, channels)
+
+
+def mix_channels(channel_data, mode='left'):
+    """
+    Select or combine channels of a (channels, samples) array.
+
+    Args:
+        channel_data: Array of shape (channels, samples)
+        mode: 'left' or 'right' (first/second channel), 'downmix' (mean of
+              all channels), 'mid' / 'side' ((L+R)/2 / (L-R)/2 of the first
+              two channels), 'all' (unchanged) or a channel index
+
+    Single channels are returned as views; combinations are computed in
+    one vectorized pass into float32.
+    """
+    channels = channel_data.shape[0]
+
+    if mode == 'all':
+        return channel_data
+    if isinstance(mode, (int, np.integer)):
+        if not 0 <= mode < channels:
+            raise ValueError(f"Channel {mode} out of range for {channels} channels")
+        return channel_data[mode]
+    if mode == 'left' or (channels == 1 and mode in ('right', 'downmix', 'mid')):
+        return channel_data[0]
+    if mode == 'right':
+        return channel_data[1]
+    if mode == 'downmix':
+        return channel_data.mean(axis=0, dtype=np.float32)
+    if mode in ('mid', 'side'):
+        left = channel_data[0].astype(np.float32)
+        if channels == 1:
+            return np.zeros_like(left)  # Mono has no side signal
+        right = channel_data[1]
+        combined = left + right if mode == 'mid' else left - right
+        combined *= np.float32(0.5)
+        return combined
+
+    raise ValueError(f"Unknown channel mode '{mode}', expected one of {CHANNEL_MODES}")
+
+
+class WaveReader:
+    """
+    Read a WAV file incrementally from one open handle.
+
+    The header is parsed once on open and exposed as `info` (same keys as
+    analyzer.get_wave_info). Audio is read either all at once with read()
+    or as fixed-size blocks with blocks(), which never holds more than one
+    block (plus overlap) in memory.
+
+    Samples are returned in the 16-bit range by default, or as float32 in
+    [-1, 1] when the reader is created with normalize=True. `mix` selects
+    which channel data is returned (see mix_channels); with mix='all'
+    reads and blocks are (channels, samples) arrays.
+
+    Usage:
+        with WaveReader(path) as reader:
+            for block in reader.blocks(block_size=4096, overlap=1024):
+                ...
+    """
+
+    def __init__(self, file_path, normalize=False, mix='left'):
+        self.file_path = file_path
+        self.normalize = normalize
+        self.mix = mix
+        self._file = open(file_path, "rb")
+        self._position = 0
+
+        try:
+            file_size = os.fstat(self._file.fileno()).st_size
+            self.info = _parse_chunks(self._read_at, file_size)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_at(self, offset, size):
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def close(self):
+        """Close the underlying file handle."""
+        self._file.close()
+
+    def tell(self):
+        """Return the current frame position."""
+        return self._position
+
+    def seek(self, frame):
+        """Move to frame index `frame`."""
+        self._position = min(max(frame, 0), self.info['total_samples'])
+
+    def read(self, num_frames=None):
+        """Read `num_frames` frames (default: the rest of the file)."""
+        info = self.info
+        remaining = info['total_samples'] - self._position
+        if num_frames is None or num_frames > remaining:
+            num_frames = remaining
+
+        raw_data = self._read_at(
+            info['data_offset'] + self._position * info['block_align'],
+            num_frames * info['block_align']
+        )
+        self._position += num_frames
+
+        frames = decode_frames(raw_data, info['channels'], info['sample_width'],
+                               info['format_tag'], self.normalize)
+        return mix_channels(frames.T, self.mix)
+
+    def blocks(self, block_size=DEFAULT_BLOCK_SIZE, overlap=0, start=0, stop=None):
+        """
+        Yield consecutive blocks of `block_size` frames.
+
+        Args:
+            block_size: Frames per yielded block
+            overlap: Frames shared between consecutive blocks
+            start: Frame index to start reading from
+            stop: Frame index to stop before (default: end of file), so
+                  workers can each stream one shard of a file
+
+        Each block after the first repeats the last `overlap` frames of the
+        previous one. The final block may be shorter than `block_size`.
+        """
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        if not 0 <= overlap < block_size:
+            raise ValueError("overlap must be in [0, block_size)")
+
+        hop = block_size - overlap
+        if stop is None or stop > self.info['total_samples']:
+            stop = self.info['total_samples']
+        self.seek(start)
+
+        block = self.read(min(block_size, max(stop - self._position, 0)))
+        while block.shape[-1] > 0:
+            yield block
+            if self._position >= stop:
+                break
+
+            new_frames = self.read(min(hop, stop - self._position))
+            if overlap:
+                tail = block[..., block.shape[-1] - overlap:]
+                block = np.concatenate((tail, new_frames), axis=-1)
+            else:
+                block = new_frames
+
+
+def iter_wave_blocks(file_path, block_size=DEFAULT_BLOCK_SIZE, overlap=0,
+                     normalize=False, mix='left'):
+    """
+    Stream a WAV file as fixed-size blocks.
+
+    Convenience wrapper around WaveReader.blocks() that opens and closes
+    the file itself.
+    """
+    with WaveReader(file_path, normalize=normalize, mix=mix) as reader:
+        yield from reader.blocks(block_size, overlap)
+
+
+def parse_wave_header(buffer):
+    """
+    Parse the RIFF/WAVE header of an in-memory or memory-mapped file.
+
+    Returns a dictionary with the file info keys plus:
+        format_tag: WAV format tag (PCM, IEEE float, ...)
+        block_align: Bytes per frame
+        data_offset: Byte offset of the PCM data
+        data_size: Size of the PCM data in bytes
+    """
+    buffer = memoryview(buffer).cast('B')
+    return _parse_chunks(lambda offset, size: bytes(buffer[offset:offset + size]),
+                         len(buffer))
+
+
+def map_wave_data(source, normalize=False, mix='left'):
+    """
+    Expose the PCM data of a WAV file as a zero-copy NumPy view.
+
+    Args:
+        source: Path to a WAV file (memory-mapped) or a bytes-like object
+                such as an uploaded file's buffer (viewed in place)
+        normalize: Scale the samples to float32 in [-1, 1]
+        mix: Channel mode used for 'waveform' (see mix_channels)
+
+    Opening is O(1) in the file size: only the header is parsed, and pages
+    of a mapped file are read from disk when an analysis touches them.
+    Packed 24-bit data cannot be viewed in place and raises ValueError.
+
+    Returns the same dictionary as analyzer.load_wave_data() plus:
+        frames: (samples, channels) view of the PCM data in its stored
+                dtype; frames[:, c] is a strided view of channel c
+    16-bit PCM 'channel_data' is a transposed view of 'frames'; other
+    formats are scaled into a new array.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if os.path.getsize(source) == 0:
+            raise ValueError("WAV file is empty")
+        buffer = np.memmap(source, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.frombuffer(source, dtype=np.uint8)
+
+    info = parse_wave_header(buffer)
+    dtype = _native_dtype(info['sample_width'], info['format_tag'])
+    if dtype is None:
+        raise ValueError("Packed 24-bit WAV data cannot be memory-mapped")
+
+    data = buffer[info['data_offset']:info['data_offset'] + info['data_size']]
+    frames = data.view(dtype).reshape(-1, info['channels'])
+
+    channel_data = scale_samples(frames.T, info['sample_width'],
+                                 info['format_tag'], normalize)
+
+    return {
+        'waveform': mix_channels(channel_data, mix),
+        'channel_data': channel_data,
+        'frames': frames,
+        'sample_rate': info['sample_rate'],
+        'duration': info['duration'],
+        'channels': info['channels'],
+        'file_info': info
+    }
@@ -14,8 +14,17 @@ import os
 from datetime import datetime
 
 # Import analysis modules
-from sound_analysis.analyzer import get_wave_info, load_wave_data, analyze_audio_levels
-from sound_analysis.plotly_viz import create_all_visualizations, create_frequency_spectrum_plot
+from sound_analysis.analyzer import ANALYSIS_CACHE_VERSION, load_wave_data, analyze_audio_levels
+from sound_analysis.plotly_viz import (
+    create_all_visualizations,
+    create_frequency_spectrum_plot,
+    create_spectrogram_plot,
+    create_zoomed_spectrogram_plot,
+    create_zoomed_waveform_plot,
+    overview_pitch_track
+)
+from sound_analysis.pyramid import build_pyramid
+from sound_analysis.stft import STFT_WINDOWS, cached_stft, stft_params
 from sound_analysis.audio_processing import (
     convert_audio_to_wav,
     detect_harmonics,
@@ -26,6 +35,8 @@ from sound_analysis.audio_processing import (
     apply_bandpass_filter,
     PYDUB_AVAILABLE
 )
+from sound_analysis.wav_io import map_wave_data, mix_channels
+from sound_analysis.cache import AnalysisCache, hash_content, make_cache_key
 
 # Page configuration
 st.set_page_config(
@@ -70,18 +81,38 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_analysis_cache():
+    """
+    Analysis results cache shared by all sessions.
+    
+    Results are keyed by upload content hash, so a file any user already
+    analyzed is served from memory. Set SOUND_ANALYSIS_CACHE_DIR to also
+    keep results on disk across restarts.
+    """
+    return AnalysisCache(
+        max_bytes=int(os.environ.get('SOUND_ANALYSIS_CACHE_MB', 512)) * 1024 * 1024,
+        disk_dir=os.environ.get('SOUND_ANALYSIS_CACHE_DIR')
+    )
+
+
 def init_session_state():
     """Initialize session state variables."""
     defaults = {
         'analysis_complete': False,
         'file_info': None,
         'audio_levels': None,
-        'figures': None,
         'waveform': None,
+        'plot_waveform': None,
         'sample_rate': None,
         'duration': None,
         'harmonics': None,
-        'uploaded_filename': None
+        'pyramid': None,
+        'pitch': None,
+        'analysis_key': None,
+        'uploaded_filename': None,
+        'figures': None,
+        'figures_key': None
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -111,7 +142,58 @@ def render_sidebar():
             help="Larger = better frequency resolution, worse time resolution"
         )
         
+        window_type = st.selectbox(
+            "Window Type",
+            STFT_WINDOWS,
+            format_func=str.capitalize,
+            help="Hann suits most audio; Blackman lowers leakage, rectangular sharpens peaks"
+        )
+        
+        overlap = st.select_slider(
+            "Overlap",
+            options=[0, 25, 50, 75, 87.5],
+            value=50,
+            format_func=lambda pct: f"{pct}%",
+            help="More overlap = smoother time axis (long files are capped to a frame budget)"
+        )
+        
+        pad_factor = st.select_slider(
+            "Zero Padding",
+            options=[1, 2, 4, 8],
+            value=1,
+            format_func=lambda factor: f"{factor}x",
+            help="Interpolates the frequency axis; does not add resolution"
+        )
+        
         st.session_state['fft_window'] = fft_window
+        st.session_state['stft_params'] = stft_params(
+            window_size=fft_window,
+            hop_size=max(1, round(fft_window * (1 - overlap / 100))),
+            window=window_type,
+            pad_factor=pad_factor
+        )
+        
+        st.divider()
+        
+        # Multi-channel Settings
+        st.markdown("### 🎧 Channels")
+        
+        channel_mode = st.selectbox(
+            "Multi-channel Mode",
+            ['left', 'right', 'downmix', 'mid', 'side', 'all'],
+            format_func=lambda mode: {
+                'left': 'Left / first channel',
+                'right': 'Right / second channel',
+                'downmix': 'Downmix (average)',
+                'mid': 'Mid (L+R)/2',
+                'side': 'Side (L-R)/2',
+                'all': 'All channels'
+            }[mode],
+            help="How stereo and multi-channel files are analyzed. 'All channels' "
+                 "plots every channel and measures levels on the downmix."
+        )
+        
+        st.session_state['channel_mode'] = channel_mode
         
         st.divider()
         
@@ -207,19 +289,44 @@ def render_harmonics(harmonics):
         return
     
     st.markdown("### 🎵 Harmonic Analysis")
-    st.caption("Detected frequency peaks (fundamental and overtones)")
+    st.caption("Detected fundamental and the harmonics found at its multiples")
     
     cols = st.columns(min(5, len(harmonics)))
     
     for i, harm in enumerate(harmonics[:5]):
         with cols[i]:
             freq_str = f"{harm['frequency']:.1f} Hz" if harm['frequency'] < 1000 else f"{harm['frequency']/1000:.2f} kHz"
-            label = "Fundamental" if i == 0 else f"Harmonic {i}"
+            label = "Fundamental" if harm['harmonic'] == 1 else f"Harmonic {harm['harmonic']}"
             st.metric(label, freq_str, f"{harm['magnitude_db']:.1f} dB")
 
 
+def build_figures():
+    """
+    Build the figures of the current analysis, once per analysis.
+    
+    The figures are kept in the session under the analysis key, so
+    reruns (widget changes, zooming) reuse them instead of recomputing
+    the spectrum, PSD and decimated traces. The spectrogram is left out:
+    render_visualizations() draws it with the sidebar settings from the
+    cached STFT.
+    """
+    figures_key = (st.session_state.analysis_key, st.session_state.uploaded_filename)
+    if st.session_state.figures_key != figures_key:
+        st.session_state.figures = create_all_visualizations(
+            st.session_state.plot_waveform,
+            st.session_state.sample_rate,
+            st.session_state.duration,
+            st.session_state.uploaded_filename,
+            spectrogram=False
+        )
+        st.session_state.figures_key = figures_key
+    return st.session_state.figures
+
+
 def render_visualizations(figures):
     """Render all visualizations in a grid."""
+    figures = dict(figures, spectrogram=spectrogram_figure())
+    
     st.markdown("### 📈 Visualizations")
     st.markdown("*Hover for values • Click camera icon to download • Zoom/pan with mouse*")
     
@@ -245,40 +352,109 @@ def render_visualizations(figures):
         st.plotly_chart(figures['histogram'], use_container_width=True, key='histogram')
 
 
-def analyze_audio(uploaded_file):
+def spectrogram_figure():
+    """
+    Spectrogram of the current analysis with the sidebar FFT settings.
+    
+    The STFT is cached under the analysis key plus its parameters, so
+    changing the window recomputes only the transform, not the analysis.
+    """
+    stft = cached_stft(
+        get_analysis_cache(),
+        st.session_state.analysis_key,
+        st.session_state.waveform,
+        st.session_state.sample_rate,
+        st.session_state.get('stft_params')
+    )
+    return create_spectrogram_plot(
+        st.session_state.waveform, st.session_state.sample_rate,
+        f"Spectrogram - {st.session_state.uploaded_filename}",
+        pitch=st.session_state.pitch,
+        stft=stft
+    )
+
+
+def render_zoom(pyramid, duration):
+    """Render a zoomable waveform/spectrogram detail view from the overview pyramid."""
+    if pyramid is None or duration <= 0:
+        return
+    
+    st.markdown("### 🔍 Zoom")
+    st.caption("Detail views are served from a precomputed multi-resolution overview")
+    
+    start, end = st.slider(
+        "Time range (seconds)",
+        min_value=0.0,
+        max_value=float(duration),
+        value=(0.0, float(duration)),
+        step=max(float(duration) / 1000, 0.001),
+        key='zoom_range'
+    )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(create_zoomed_waveform_plot(pyramid, start, end),
+                        use_container_width=True, key='zoom_waveform')
+    with col2:
+        st.plotly_chart(create_zoomed_spectrogram_plot(pyramid, start, end),
+                        use_container_width=True, key='zoom_spectrogram')
+
+
+def analyze_audio(uploaded_file, channel_mode='left'):
     """Analyze the uploaded audio file."""
     # Get file extension
     file_ext = os.path.splitext(uploaded_file.name)[1].lower()
     
-    # Convert to WAV if needed
-    tmp_path = convert_audio_to_wav(uploaded_file, file_ext)
+    tmp_path = None
+    wave_data = None
+    
+    if file_ext == '.wav':
+        # View the uploaded bytes in place instead of writing a temp file
+        try:
+            wave_data = map_wave_data(uploaded_file.getbuffer())
+        except ValueError:
+            wave_data = None  # Unsupported layout, fall back to the WAV reader
+    
+    if wave_data is None:
+        # Convert to WAV if needed
+        tmp_path = convert_audio_to_wav(uploaded_file, file_ext)
     
     try:
-        # Get file info
-        file_info = get_wave_info(tmp_path)
+        if wave_data is None:
+            # Load waveform data and file info from one open handle
+            wave_data = load_wave_data(tmp_path)
         
-        # Load waveform data
-        wave_data = load_wave_data(tmp_path)
-        waveform = wave_data['waveform']
+        file_info = wave_data['file_info']
         sample_rate = wave_data['sample_rate']
         duration = wave_data['duration']
         
+        # Plots may show every channel; metrics use a single mixed signal
+        # (copied to detach from the upload buffer)
+        plot_waveform = np.array(mix_channels(wave_data['channel_data'], channel_mode))
+        if channel_mode == 'all':
+            waveform = mix_channels(plot_waveform, 'downmix')
+        else:
+            waveform = plot_waveform
+        
         # Analyze audio levels
         audio_levels = analyze_audio_levels(waveform)
         
-        # Detect harmonics
+        # Detect harmonics (frame-averaged, independent of the plot spectrum)
         harmonics = detect_harmonics(waveform, sample_rate)
         
-        # Generate visualizations
-        figures = create_all_visualizations(
-            waveform, sample_rate, duration, uploaded_file.name
-        )
+        # Pitch track for the spectrogram overlay
+        pitch = overview_pitch_track(plot_waveform, sample_rate)
+        
+        # Multi-resolution overview for the zoom view
+        pyramid = build_pyramid(plot_waveform, sample_rate)
         
         return {
             'file_info': file_info,
             'audio_levels': audio_levels,
-            'figures': figures,
+            'pyramid': pyramid,
+            'pitch': pitch,
             'waveform': waveform,
+            'plot_waveform': plot_waveform,
             'sample_rate': sample_rate,
             'duration': duration,
             'harmonics': harmonics,
@@ -286,7 +462,7 @@ def analyze_audio(uploaded_file):
         }
         
     except Exception as e:
-        if os.path.exists(tmp_path):
+        if tmp_path and os.path.exists(tmp_path):
             os.unlink(tmp_path)
         raise e
 
@@ -315,23 +491,40 @@ def main():
         if st.button("🔬 Analyze Audio", type="primary", use_container_width=True):
             with st.spinner("Analyzing audio... This may take a moment for large files."):
                 try:
-                    results = analyze_audio(uploaded_file)
+                    channel_mode = st.session_state.get('channel_mode', 'left')
+                    cache = get_analysis_cache()
+                    # Content only: the same bytes under another name still hit
+                    cache_key = make_cache_key(
+                        hash_content(uploaded_file.getbuffer()),
+                        channel_mode,
+                        ANALYSIS_CACHE_VERSION
+                    )
                     
-                    # Store in session state
+                    results = cache.get(cache_key)
+                    if results is None:
+                        results = analyze_audio(uploaded_file, channel_mode)
+                        
+                        # Clean up temp file
+                        wav_path = results.pop('wav_path', None)
+                        if wav_path and os.path.exists(wav_path):
+                            os.unlink(wav_path)
+                        
+                        cache.put(cache_key, results)
+                    
+                    # Store in session state (references to the shared cached results)
                     st.session_state.analysis_complete = True
                     st.session_state.file_info = results['file_info']
                     st.session_state.audio_levels = results['audio_levels']
-                    st.session_state.figures = results['figures']
                     st.session_state.waveform = results['waveform']
+                    st.session_state.plot_waveform = results['plot_waveform']
                     st.session_state.sample_rate = results['sample_rate']
                     st.session_state.duration = results['duration']
                     st.session_state.harmonics = results['harmonics']
+                    st.session_state.pyramid = results['pyramid']
+                    st.session_state.pitch = results['pitch']
+                    st.session_state.analysis_key = cache_key
                     st.session_state.uploaded_filename = uploaded_file.name
                     
-                    # Clean up temp file
-                    if os.path.exists(results.get('wav_path', '')):
-                        os.unlink(results['wav_path'])
-                    
                     st.success("✅ Analysis complete!")
                     st.rerun()
                     
@@ -373,8 +566,8 @@ Audio Levels:
 
 Harmonics Detected:
 """
-                for i, h in enumerate(st.session_state.harmonics[:5]):
-                    label = "Fundamental" if i == 0 else f"Harmonic {i}"
+                for h in st.session_state.harmonics[:5]:
+                    label = "Fundamental" if h['harmonic'] == 1 else f"Harmonic {h['harmonic']}"
                     summary += f"- {label}: {h['frequency']:.1f} Hz ({h['magnitude_db']:.1f} dB)\n"
                 
                 st.download_button(
@@ -421,7 +614,12 @@ Harmonics Detected:
             st.divider()
             
             # Visualizations
-            render_visualizations(st.session_state.figures)
+            render_visualizations(build_figures())
+            
+            st.divider()
+            
+            # Zoomable detail views
+            render_zoom(st.session_state.pyramid, st.session_state.duration)
             
             # Educational section
             st.divider()
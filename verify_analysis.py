@@ -6,10 +6,169 @@ This script compares the app's analysis results with scipy (trusted library)
 to verify the calculations are correct.
 """
 
-import wave
+import os
+import struct
+import subprocess
+import sys
+import tempfile
 import numpy as np
+from scipy import signal
 from scipy.io import wavfile
 from sound_analysis.analyzer import get_wave_info, load_wave_data, analyze_audio_levels
+from sound_analysis.filters import design_filter, filter_blocks, filter_signal
+from sound_analysis.levels import LevelAccumulator, compute_level_metrics
+from sound_analysis.spectral import WelchAccumulator
+from sound_analysis.stft import StreamingSTFT, compute_stft
+from sound_analysis.wav_io import (WAVE_FORMAT_EXTENSIBLE, WAVE_FORMAT_IEEE_FLOAT,
+                                   WAVE_FORMAT_PCM, map_wave_data)
+
+
+# Start-up budget for importing the analysis modules in a fresh interpreter
+# (CLI runs and batch workers); measured at ~0.15s without scipy/plotting
+IMPORT_BUDGET_SECONDS = 0.5
+
+# Modules that must only load when a function needing them is called
+LAZY_MODULES = ('scipy.signal', 'matplotlib', 'plotly', 'pydub')
+
+# Block size for the streaming checks (deliberately not a power of two,
+# so blocks never line up with frame or segment boundaries)
+STREAM_BLOCK_SIZE = 10007
+
+# Largest relative error accepted between streamed and one-shot results
+# (float32 outputs, such as STFT power, get the looser bound)
+STREAM_TOLERANCE = 1e-9
+STREAM_TOLERANCE_FLOAT32 = 1e-6
+
+# Synthetic signal written in every supported WAV format (stereo, with an
+# odd sample count so packed 24-bit data ends off a word boundary)
+DECODE_SAMPLE_RATE = 8000
+DECODE_NUM_SAMPLES = 4001
+
+# SubFormat GUID of WAVE_FORMAT_EXTENSIBLE files, after its 2-byte format tag
+KSDATAFORMAT_GUID_TAIL = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+
+def measure_import_time(module='sound_analysis.batch'):
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns (seconds, heavy modules that were loaded as a side effect).
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                            text=True, check=True).stdout.splitlines()
+    loaded = output[1].split(',') if len(output) > 1 and output[1] else []
+    return float(output[0]), loaded
+
+
+def iter_blocks(waveform, block_size=STREAM_BLOCK_SIZE):
+    """Yield consecutive blocks of the last axis of `waveform`."""
+    for start in range(0, waveform.shape[-1], block_size):
+        yield waveform[..., start:start + block_size]
+
+
+def relative_error(actual, expected):
+    """Largest absolute difference, relative to the largest expected value."""
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    if actual.shape != expected.shape:
+        return np.inf
+    scale = np.max(np.abs(expected)) if expected.size else 0.0
+    return float(np.max(np.abs(actual - expected), initial=0.0) / (scale or 1.0))
+
+
+def report_equivalence(checks, name, error, tolerance=STREAM_TOLERANCE):
+    """Record and print one streamed-vs-one-shot comparison."""
+    match = error <= tolerance
+    checks.append(match)
+    status = "PASS" if match else "FAIL"
+    print(f"   {name}: max relative error {error:.1e} [{status}]")
+
+
+def write_wav(path, sample_rate, frames, sample_width, format_tag=WAVE_FORMAT_PCM,
+              extensible=False):
+    """
+    Write raw interleaved sample bytes as a WAV file.
+
+    For layouts scipy.io.wavfile cannot write: packed 24-bit data and
+    WAVE_FORMAT_EXTENSIBLE headers.
+
+    Args:
+        path: Output file path
+        sample_rate: Samples per second
+        frames: Raw sample bytes, interleaved by channel
+        sample_width: Bytes per sample
+        format_tag: WAVE_FORMAT_PCM or WAVE_FORMAT_IEEE_FLOAT
+        extensible: Write a 40-byte WAVE_FORMAT_EXTENSIBLE 'fmt ' chunk
+    """
+    channels = 2
+    block_align = channels * sample_width
+    fmt = struct.pack('<HHIIHH', WAVE_FORMAT_EXTENSIBLE if extensible else format_tag,
+                      channels, sample_rate, sample_rate * block_align, block_align,
+                      8 * sample_width)
+    if extensible:
+        fmt += struct.pack('<HHIH', 22, 8 * sample_width, 0x3, format_tag) + KSDATAFORMAT_GUID_TAIL
+
+    data = frames + b'\x00' * (len(frames) & 1)  # Chunks are word aligned
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sI4s', b'RIFF', 4 + 8 + len(fmt) + 8 + len(data), b'WAVE'))
+        f.write(struct.pack('<4sI', b'fmt ', len(fmt)) + fmt)
+        f.write(struct.pack('<4sI', b'data', len(frames)) + data)
+
+
+def write_decoder_files(directory):
+    """
+    Write a synthetic stereo signal in each supported WAV format.
+
+    Returns a list of (name, path, expected) tuples, where `expected` is
+    the (channels, samples) float64 signal each file holds, in [-1, 1].
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(DECODE_NUM_SAMPLES) / DECODE_SAMPLE_RATE
+    source = np.stack([0.8 * np.sin(2 * np.pi * 440 * t),
+                       rng.uniform(-1.0, 1.0, DECODE_NUM_SAMPLES)])
+
+    def quantize(bits):
+        full_scale = 2 ** (bits - 1)
+        return np.clip(np.round(source * full_scale), -full_scale, full_scale - 1).astype(np.int64)
+
+    int8 = quantize(8)
+    int16 = quantize(16)
+    int24 = quantize(24)
+    int32 = quantize(32)
+    # Little-endian packed 24-bit: the low three bytes of each int32
+    packed24 = np.ascontiguousarray(int24.T, dtype='<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+    cases = []
+    scipy_files = (
+        ("8-bit unsigned PCM", (int8 + 128).astype(np.uint8), int8 / 2.0 ** 7),
+        ("16-bit PCM", int16.astype(np.int16), int16 / 2.0 ** 15),
+        ("32-bit PCM", int32.astype(np.int32), int32 / 2.0 ** 31),
+        ("32-bit float", source.astype(np.float32), source.astype(np.float32)),
+    )
+    for name, samples, expected in scipy_files:
+        path = os.path.join(directory, f"{len(cases)}.wav")
+        wavfile.write(path, DECODE_SAMPLE_RATE, samples.T)
+        cases.append((name, path, expected))
+
+    manual_files = (
+        ("Packed 24-bit PCM", packed24, 3, WAVE_FORMAT_PCM, False, int24 / 2.0 ** 23),
+        ("EXTENSIBLE 24-bit PCM", packed24, 3, WAVE_FORMAT_PCM, True, int24 / 2.0 ** 23),
+        ("EXTENSIBLE 32-bit float", source.T.astype('<f4').tobytes(), 4,
+         WAVE_FORMAT_IEEE_FLOAT, True, source.astype(np.float32)),
+    )
+    for name, frames, sample_width, format_tag, extensible, expected in manual_files:
+        path = os.path.join(directory, f"{len(cases)}.wav")
+        write_wav(path, DECODE_SAMPLE_RATE, frames, sample_width, format_tag, extensible)
+        cases.append((name, path, expected))
+
+    return cases
 
 
 def verify_analysis(file_path):
@@ -96,6 +255,98 @@ def verify_analysis(file_path):
     status = "PASS" if valid_range else "FAIL"
     print(f"   Dynamic Range: {dynamic_range:.2f} dB (reasonable range) [{status}]")
 
+    print()
+    print("4. START-UP COST")
+    print("-" * 40)
+
+    for module in ('sound_analysis.analyzer', 'sound_analysis.batch', 'sound_analysis.cli'):
+        seconds, loaded = measure_import_time(module)
+        match = seconds <= IMPORT_BUDGET_SECONDS and not loaded
+        checks.append(match)
+        status = "PASS" if match else "FAIL"
+        extra = f", loaded {', '.join(loaded)}" if loaded else ""
+        print(f"   import {module}: {seconds:.3f}s "
+              f"(budget {IMPORT_BUDGET_SECONDS}s{extra}) [{status}]")
+
+    print()
+    print("5. STREAMING EQUIVALENCE")
+    print("-" * 40)
+
+    # Level statistics: block-by-block updates, and two merged halves
+    expected = compute_level_metrics(waveform)
+    level_keys = ('max_amplitude', 'min_amplitude', 'mean_amplitude', 'mean_square')
+
+    streamed = LevelAccumulator()
+    for block in iter_blocks(waveform):
+        streamed.update(block)
+    streamed = streamed.metrics()
+    report_equivalence(checks, "LevelAccumulator (blocks)", max(
+        relative_error(streamed[key], expected[key]) for key in level_keys))
+
+    half = waveform.shape[-1] // 2
+    merged = LevelAccumulator().update(waveform[..., :half])
+    merged = merged.merge(LevelAccumulator().update(waveform[..., half:])).metrics()
+    report_equivalence(checks, "LevelAccumulator.merge", max(
+        relative_error(merged[key], expected[key]) for key in level_keys))
+
+    # Causal filtering with the state carried across blocks
+    sos = design_filter('lowpass', min(1000, app_info['sample_rate'] / 4), 5,
+                        app_info['sample_rate'])
+    streamed = np.concatenate(list(filter_blocks(iter_blocks(waveform), sos)), axis=-1)
+    report_equivalence(checks, "StreamingFilter (blocks)", relative_error(
+        streamed, filter_signal(waveform, sos, zero_phase=False)))
+
+    # STFT frames completed block by block (no output caps on either side)
+    stft = StreamingSTFT(app_info['sample_rate'], window_size=1024, hop_size=256)
+    streamed = np.concatenate([stft.process(block) for block in iter_blocks(waveform)], axis=-1)
+    expected = compute_stft(waveform, app_info['sample_rate'], window_size=1024, hop_size=256,
+                            max_frames=np.inf, max_cells=None)
+    report_equivalence(checks, "StreamingSTFT (blocks)",
+                       relative_error(streamed, expected['power']), STREAM_TOLERANCE_FLOAT32)
+
+    # Welch PSD against scipy: uneven blocks, and two shards merged. The
+    # first shard runs `noverlap` samples past the split (as overlapping
+    # reader blocks would) so no segment is lost at the boundary
+    sample_rate = app_info['sample_rate']
+    # (float64 input: scipy keeps integer input at float32 precision)
+    _, expected = signal.welch(waveform.astype(np.float64), fs=sample_rate, nperseg=1024)
+
+    psd = WelchAccumulator(sample_rate, 1024)
+    for block in iter_blocks(waveform):
+        psd.update(block)
+    report_equivalence(checks, "WelchAccumulator (blocks) vs scipy",
+                       relative_error(psd.result()['psd'], expected))
+
+    split = waveform.shape[-1] // 2 // psd.hop * psd.hop
+    first = WelchAccumulator(sample_rate, 1024).update(waveform[..., :split + psd.noverlap])
+    second = WelchAccumulator(sample_rate, 1024).update(waveform[..., split:])
+    merged = first.merge(second)
+    match = merged.num_segments == psd.num_segments
+    report_equivalence(checks, "WelchAccumulator.merge vs scipy",
+                       relative_error(merged.result()['psd'], expected) if match else np.inf)
+
+    print()
+    print("6. FORMAT DECODING")
+    print("-" * 40)
+
+    # Synthetic files in every supported layout, decoded by the buffered
+    # reader and the memory-mapped view (which rejects packed 24-bit data)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, path, expected in write_decoder_files(directory):
+            decoded = load_wave_data(path, normalize=True, mix='all')
+            report_equivalence(checks, f"{name} (load_wave_data)",
+                               relative_error(decoded['channel_data'], expected),
+                               STREAM_TOLERANCE_FLOAT32)
+            try:
+                mapped = map_wave_data(path, normalize=True, mix='all')
+            except ValueError:
+                mapped = None
+            if mapped is not None:
+                error = relative_error(mapped['channel_data'], expected)
+                del mapped  # Release the file mapping before the directory goes
+                report_equivalence(checks, f"{name} (map_wave_data)", error,
+                                   STREAM_TOLERANCE_FLOAT32)
+
     print()
     print("=" * 60)
     passed = sum(checks)
@@ -113,11 +364,10 @@ def verify_analysis(file_path):
 
 
 if __name__ == "__main__":
-    import sys
-    
     # Default to the test file
     file_path = "data/space_odyssey_radar.wav"
     if len(sys.argv) > 1:
         file_path = sys.argv[1]
     
-    verify_analysis(file_path)
+    # Non-zero exit status on any failed check, so the script can gate CI
+    sys.exit(0 if verify_analysis(file_path) else 1)